@@ -4,127 +4,28 @@ FRLG_EXCLUDE_MOVES: set[str] = set()
 
 # --- FRLG species-line legal moves resolver (wrapper) ---
 def legal_moves_for_species_chain(species_name: str):
-    """Return legal move names for a species considering its Gen1 Kanto line (FR/LG).
-    Tries cached FR/LG-accurate set, then falls back to damaging moves for the line.
+    """Return legal move names for a species considering its whole evolution line (FR/LG).
+    A read from the per-scope family table (see family_legal_table); () if unknown.
     """
     try:
-        # Preferred: cached FRLG-accurate legal move list if available
-        moves = _frlg_cached_legal_for_species(species_name)
+        return _legal_damaging_moves_for_chain(species_name)
     except Exception:
-        moves = None
-    if not moves:
-        try:
-            moves = _legal_damaging_moves_for_chain(species_name)
-        except Exception:
-            moves = None
-    return moves or []
-
-
-def _frlg_cached_legal_for_species(species_name: str):
-    """Cache FRLG-accurate species-line damaging moves for quick reuse."""
-    key = species_key(species_name)
-    cache = STATE.setdefault("_frlg_legal_cache", {})
-    if key in cache:
-        return cache[key]
-    moves = _legal_damaging_moves_for_chain(species_name)
-    cache[key] = moves
-    return moves
+        return ()
 
 def _legal_damaging_moves_for_chain(species_name: str):
-    try:
-        dex = get_pokedex_cached() or {}
-        lsets = get_showdown_learnsets_cached() or {}
-    except Exception:
-        return []
-
     maxdex = dex_max()
-
-    def _dex_rec(name: str):
-        sid = ps_id(name)
-        rec = dex.get(sid)
-        if rec and rec.get("forme"):
-            rec = None
-        if rec and isinstance(rec.get("num"), int) and 1 <= rec["num"] <= maxdex:
-            return rec
-        for r in dex.values():
-            if r and isinstance(r.get("num"), int) and 1 <= r["num"] <= maxdex and not r.get("forme"):
-                if ps_id(r.get("name","")) == sid:
-                    return r
-        return None
-    # ...rest of your function unchanged...
-
-    sd = _dex_rec(species_name)
-    if not sd:
-        return []
-
-    # Walk to base (prevo chain) restricted to Kanto
-    base = sd
-    seen_names = set()
-    while base.get("prevo"):
-        if base.get("name") in seen_names:
-            break
-        seen_names.add(base.get("name"))
-        prev = _dex_rec(base.get("prevo"))
-        if not prev:
-            break
-        base = prev
-
-    # BFS from base through evos (Kanto only)
-    fam = []
-    q = [base]
-    seen_ids = set()
-    while q:
-        cur = q.pop(0)
-        key = ps_id(cur.get("name",""))
-        if key in seen_ids:
-            continue
-        seen_ids.add(key)
-        fam.append(cur)
-        for evn in (cur.get("evos") or []):
-            evr = _dex_rec(evn)
-            if evr and ps_id(evr.get("name","")) not in seen_ids:
-                q.append(evr)
-
-    # Map Showdown learnsets id
-    def _ls_key(name: str):
-        sid = ps_id(name)
-        if sid in lsets: 
-            return sid
-        # fallback: match by ps_id of keys
-        for k in lsets.keys():
-            if ps_id(k) == sid:
-                return k
-        return None
-
-    out = []
-    seen_moves = set()
-    for rec in fam:
-        k = _ls_key(rec.get("name",""))
-        if not k: 
-            continue
-        ls = (lsets.get(k, {}) or {}).get("learnset", {}) or {}
-        for mv_id, methods in ls.items():
-            meths = methods if isinstance(methods, list) else [methods]
-            if not any(isinstance(t, str) and (t.startswith("3L") or t == "3M" or t == "3T") for t in meths):
-                continue
-            mv = lookup_move(mv_id) or {}
-            nm = mv.get("name", clean_move_token(mv_id))
-            if not nm or not move_is_damaging(nm):
-                continue
-            if nm in seen_moves:
-                continue
-            seen_moves.add(nm)
-            out.append(nm)
-
-    out.sort()
-    return out
+    rec = dex_lookup(species_name, maxdex)
+    if not rec:
+        return ()
+    return family_legal_table(maxdex).get(ps_id(rec.get("name", "")), ())
 
 def is_base_name_151(name: str) -> bool:
     """Return True if the species is a base form (no evolves_from in species_db)."""
     sk = species_key(name)
-    sp = STATE.get("species_db", {}).get(sk, {}) or {}
+    sp = species_db().get(sk, {}) or {}
     return not bool(sp.get("evolves_from"))
 
+import numpy as np
 import streamlit as st
 def st_html(html: str):
     # Prevent Markdown from treating indented lines as a code block
@@ -132,9 +33,44 @@ def st_html(html: str):
     st.markdown(html, unsafe_allow_html=True)
 import textwrap
 import streamlit.components.v1 as components
-from typing import List, Dict, Tuple, Optional
-import json, os, urllib.request, ssl, re, csv, uuid, hashlib
-from urllib.parse import urlparse, parse_qs, urlencode, quote
+from typing import Callable, List, Dict, Tuple, Optional, FrozenSet, Iterator
+from collections import ChainMap, OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from collections.abc import Mapping
+from types import MappingProxyType
+import bisect, copy, functools, hmac, inspect, io, json, os, sys, pickle, urllib.request, urllib.error, ssl, re, csv, uuid, hashlib, threading, time, weakref
+from urllib.parse import urlparse, urlencode, quote
+
+# `python "FRLG_Companion_App - Online.py" <command>` runs a maintenance
+# command (see _cli_main at the bottom) instead of the Streamlit UI.
+CLI_COMMANDS = {"compile-bundle", "compile-encounters", "bench-moves", "load-test"}
+
+def _running_under_streamlit() -> bool:
+    try:
+        from streamlit import runtime
+        return runtime.exists()
+    except Exception:
+        return False
+
+CLI_MODE = (
+    __name__ == "__main__"
+    and len(sys.argv) > 1
+    and sys.argv[1] in CLI_COMMANDS
+    and not _running_under_streamlit()
+)
+
+# Process-wide caches below are st.cache_resource functions, and every call to
+# one hashes its arguments (tens of µs). Hot paths resolve them once per script
+# run through _run_memo instead; the module re-executes on each rerun, so this
+# dict starts empty every time and never outlives the data it points at.
+_RUN_MEMO: Dict = {}
+
+def _run_memo(key, make):
+    try:
+        return _RUN_MEMO[key]
+    except KeyError:
+        value = _RUN_MEMO[key] = make()
+        return value
 
 # --- Session persistence mode ---
 # Default: ephemeral (no disk writes, fresh state per browser session)
@@ -152,10 +88,10 @@ def _lookup_move(name):
     """
     Prefer the per-session moves_db, but *always* fall back to the master
     Play Showdown move record so types like Dark/Fire/etc. are available
-    even if the move wasn't pre-seeded into STATE["moves_db"].
+    even if the move wasn't pre-seeded into moves_db().
     """
     try:
-        rec = STATE.get("moves_db", {}).get(_lc(name))
+        rec = moves_db().get(_lc(name))
     except Exception:
         rec = None
     return rec or lookup_move(name)
@@ -190,7 +126,7 @@ def normalize_moves_list(val):
 def _coerce_learnset(ls):
     out = []
     if not ls: return out
-    if isinstance(ls, list):
+    if isinstance(ls, (list, tuple)):
         for x in ls:
             if isinstance(x, str):
                 nm = _nx(x).title()
@@ -201,7 +137,7 @@ def _coerce_learnset(ls):
             elif isinstance(x, (list, tuple)) and x:
                 nm = _nx(str(x[0])).title()
                 if nm: out.append(nm)
-    elif isinstance(ls, dict):
+    elif isinstance(ls, Mapping):
         for v in ls.values():
             out.extend(_coerce_learnset(v))
     elif isinstance(ls, str):
@@ -210,8 +146,7 @@ def _coerce_learnset(ls):
     return out
 
 def species_learnset(spec_lc):
-    spdb = STATE.get("species_db", {})
-    sp = spdb.get(_lc(spec_lc)) or {}
+    sp = species_db().get(_lc(spec_lc)) or {}
     arr = _coerce_learnset(sp.get("learnset") or [])
     if spec_lc == "articuno":
         need = [m for m in ["Gust","Powder Snow"] if m not in arr]; arr = need + arr
@@ -1208,9 +1143,7 @@ STATE_BAK  = "state.backup.json"
 # =============================================================================
 # Globals (in-memory)
 # =============================================================================
-MOVES_MASTER: Dict[str, Dict] = {}
-MOVES_BY_NAME: Dict[str, Dict] = {}
-MOVES_BY_ID: Dict[str, Dict] = {}
+MOVES = None  # MoveRegistry, set by load_moves_master() (read it through move_registry())
 EVOS: Dict[str, List[Dict]] = {}
 
 TRADE_REWARD_SPECIES = {"mrmime","farfetchd","jynx","lickitung"}
@@ -1230,31 +1163,57 @@ def do_rerun():
         except Exception:
             pass
 
+_NON_ALNUM_RE = re.compile(r"[^a-z0-9]")
+_INVISIBLES_RE = re.compile(r"[\u200b-\u200f\u202a-\u202e]")
+_WHITESPACE_RE = re.compile(r"\s+")
+_PARENTHETICAL_RE = re.compile(r"\(.*?\)")
+_NON_DIGIT_RE = re.compile(r"\D")
+_GEN3_LEVELUP_RE = re.compile(r"^3L(\d+)$")
+_DIGITS_RE = re.compile(r"\d+")
+_LINE_BREAK_RE = re.compile("\r\n|[\n\r\x0b\x0c\x1c\x1d\x1e\x85\u2028\u2029]")
+
 def norm_key(name: str) -> str:
     return (name or "").strip().lower()
 
 def move_id(s: str) -> str:
-    return re.sub(r"[^a-z0-9]", "", (s or "").lower())
+    return _NON_ALNUM_RE.sub("", (s or "").lower())
 
 def ps_id(name: str) -> str:
-    return re.sub(r"[^a-z0-9]","",(name or "").lower()).replace("♀","f").replace("♂","m")
+    return _NON_ALNUM_RE.sub("",(name or "").lower()).replace("♀","f").replace("♂","m")
 
 def species_key(name: str) -> str:
     s = (name or "").lower().replace("♀","f").replace("♂","m")
-    return re.sub(r"[^a-z0-9]","",s)
+    return _NON_ALNUM_RE.sub("",s)
 
 def clean_invisibles(s: str) -> str:
     if not s: return s
     s = s.replace("\u00A0"," ").replace("\u202F"," ").replace("\u2009"," ")
     s = s.replace("\u2013","-").replace("\u2014","-")
-    s = re.sub(r"[\u200b-\u200f\u202a-\u202e]", "", s)
-    s = re.sub(r"\s+", " ", s)
+    s = _INVISIBLES_RE.sub("", s)
+    s = _WHITESPACE_RE.sub(" ", s)
     return s
 
+# Raw move tokens repeat constantly (every learnset, every sheet row, every
+# rerun), so each is cleaned and resolved once per process. These are plain
+# dicts rather than bounded_cache: its lock and LRU bookkeeping cost about as
+# much as cleaning a short token. A memo is emptied when it reaches the cap.
+TOKEN_MEMO_MAX = 8192
+
+@st.cache_resource(show_spinner=False)
+def _clean_token_memo() -> Dict[str, str]:
+    return {}
+
 def clean_move_token(s: str) -> str:
-    s = clean_invisibles((s or "").strip())
-    s = re.sub(r"\(.*?\)", "", s).strip()
-    return s
+    memo = _run_memo("clean_token_memo", _clean_token_memo)
+    try:
+        return memo[s]
+    except KeyError:
+        pass
+    out = _PARENTHETICAL_RE.sub("", clean_invisibles((s or "").strip())).strip()
+    if len(memo) >= TOKEN_MEMO_MAX:
+        memo.clear()
+    memo[s] = out
+    return out
 
 def normalize_type(t: Optional[str]) -> Optional[str]:
     if not t: return None
@@ -1317,7 +1276,7 @@ def _default_state() -> Dict:
                 "saveload": True, "settings": True
             }
         },
-        "opponents": {"meta":{"sheet_url":"","last_loaded":""},"encounters":[], "cleared":[]},
+        "opponents": {"meta":{"sheet_url":"","last_loaded":""},"beaten":0, "cleared":[]},
         "last_battle_pick": [0,0]
     }
 
@@ -1331,10 +1290,18 @@ def _atomic_write_json(path: str, data: Dict):
     with open(STATE_BAK, "w", encoding="utf-8") as fb:
         fb.write(payload); fb.flush(); os.fsync(fb.fileno())
 
+# Rebuilt from the game data on demand, so never written to a save.
+DERIVED_STATE_KEYS = ("species_db", "moves_db")
+
+def state_for_save(state: Dict) -> Dict:
+    """User progress only: drops derived tables and "_"-prefixed caches."""
+    return {k: v for k, v in state.items() if k not in DERIVED_STATE_KEYS and not k.startswith("_")}
+
 def save_state(state: Dict):
     # No-op unless you deliberately flip the flag
     if not PERSIST_TO_DISK:
         return
+    state = state_for_save(state)
     try:
         _atomic_write_json(STATE_PATH, state)
     except Exception:
@@ -1362,6 +1329,24 @@ def load_state() -> Dict:
             pass
     return _default_state()
 
+def _migrate_cleared_log(log: List[Dict], encounters: List[Dict]):
+    # Older saves kept the remaining encounters themselves and a copy of each
+    # beaten mon or trainer in the log; an entry whose copy is back in the list
+    # was undone. The log is replayed onto the shared table on the next load.
+    held = {e.get("label"): e.get("mons", []) for e in encounters or []}
+    for item in log:
+        data = item.pop("data", None)
+        item.pop("pos", None)
+        item.pop("index", None)
+        if item.get("what") == "pokemon":
+            undone = data in held.get(item.get("trainer"), [])
+        else:
+            undone = item.get("trainer") in held
+            if isinstance(data, dict) and data.get("mons"):
+                item["mons"] = [[m.get("species"), m.get("level"), m.get("source_row")] for m in data.get("mons", [])]
+        if undone:
+            item["undone"] = True
+
 def migrate_state(state: Dict) -> Dict:
     state.setdefault("stone_bag", {})
     stg = state.setdefault("settings", {})
@@ -1376,13 +1361,24 @@ def migrate_state(state: Dict) -> Dict:
     for k, v in _default_state()["settings"]["visible_pages"].items():
         vis.setdefault(k, v)
 
-    opp = state.setdefault("opponents", {"meta":{"sheet_url":"","last_loaded":""},"encounters":[],"cleared":[]})
+    opp = state.setdefault("opponents", {"meta":{"sheet_url":"","last_loaded":""},"beaten":0,"cleared":[]})
     opp.setdefault("meta", {"sheet_url":"","last_loaded":""})
-    opp.setdefault("encounters", [])
+    opp.setdefault("beaten", 0)
     opp.setdefault("cleared", [])
+    opp["meta"].pop("blocks", None)
+    legacy = opp.pop("encounters", None)
+    if legacy is not None:
+        _migrate_cleared_log(opp["cleared"], legacy)
 
     state.setdefault("last_battle_pick", [0,0])
     state.setdefault("fainted", [])
+    # Older saves carry a full copy of the species/moves tables; those now live in
+    # the shared store, and anything session-only is re-added on demand.
+    state["species_db"] = {}
+    state["moves_db"] = {}
+    state.pop("meta", None)
+    for k in [k for k in state if k.startswith("_")]:
+        state.pop(k)  # per-session caches from older versions
     try:
         rguids = {m.get("guid") for m in state.get("roster", [])}
         state["fainted"] = [g for g in state["fainted"] if g in rguids]
@@ -1396,63 +1392,1138 @@ if "STATE" not in st.session_state:
 
 STATE = st.session_state["STATE"]
 
+# =============================================================================
+# Single-flight builds
+# =============================================================================
+# A cold process (or a data refresh) sends every open session into the same
+# downloads and builds at once. Work keyed through SingleFlight runs in the
+# first thread that asks; the others wait for that run and get its result, or
+# its exception, instead of repeating it. A waiter that times out raises
+# TimeoutError while the run itself carries on for whoever is still waiting.
+SINGLE_FLIGHT_ENABLED = os.getenv("FRLG_SINGLE_FLIGHT", "1") != "0"
+SINGLE_FLIGHT_TIMEOUT = 120.0  # default wait for another thread's run, seconds
+
+class _Flight:
+    __slots__ = ("done", "result", "error", "owner")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error: Optional[BaseException] = None
+        self.owner = threading.get_ident()
+
+class SingleFlight:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.flights: Dict[object, _Flight] = {}
+        # Counted per build name (the key's first item), not per key: keys carry
+        # content hashes, so per-key counters would grow with every sheet edit.
+        self.runs: Dict[str, int] = {}
+        self.joined: Dict[str, int] = {}
+        self.timeouts = 0
+        self.enabled = SINGLE_FLIGHT_ENABLED
+
+    def run(self, key, fn, timeout: Optional[float] = None):
+        """fn() for the first caller of `key`; concurrent callers share its outcome."""
+        with self.lock:
+            flight = self.flights.get(key) if self.enabled else None
+            joining = flight is not None and flight.owner != threading.get_ident()
+            name = str(key[0] if isinstance(key, tuple) and key else key)
+            if joining:
+                self.joined[name] = self.joined.get(name, 0) + 1
+            else:
+                self.runs[name] = self.runs.get(name, 0) + 1
+                if self.enabled and flight is None:
+                    flight = self.flights[key] = _Flight()
+                else:
+                    flight = None  # disabled, or re-entered by the thread running it
+        if joining:
+            return self._wait(key, flight, timeout)
+        if flight is None:
+            return fn()
+        try:
+            flight.result = fn()
+            return flight.result
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            with self.lock:
+                self.flights.pop(key, None)
+            flight.done.set()
+
+    def _wait(self, key, flight: _Flight, timeout: Optional[float]):
+        if not flight.done.wait(SINGLE_FLIGHT_TIMEOUT if timeout is None else timeout):
+            with self.lock:
+                self.timeouts += 1
+            raise TimeoutError(f"gave up waiting for {key!r} being built by another session")
+        if flight.error is not None:
+            raise flight.error
+        return flight.result
+
+    def stats(self) -> List[Dict]:
+        with self.lock:
+            return [{"build": name, "runs": n, "joined": self.joined.get(name, 0)}
+                    for name, n in sorted(self.runs.items())]
+
+@st.cache_resource(show_spinner=False)
+def _single_flight_for_process() -> SingleFlight:
+    return SingleFlight()
+
+def single_flight() -> SingleFlight:
+    return _run_memo("single_flight", _single_flight_for_process)
+
+# =============================================================================
+# Bounded in-process caches
+# =============================================================================
+# st.cache_data pickles every result in and out and never forgets anything.
+# For small pure helpers that is more work than the function itself, so they
+# use this instead: an LRU with an optional TTL, shared by all sessions, that
+# hands back the stored object as-is (copy_result=True for results callers mutate).
+# Concurrent misses on one key are coalesced through single_flight().
+class BoundedCache:
+    def __init__(self, name: str, max_entries: int, ttl: Optional[float] = None):
+        self.name = name
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.lock = threading.Lock()
+        self.entries: "OrderedDict[tuple, Tuple[float, object]]" = OrderedDict()
+        self.hits = self.misses = self.evictions = 0
+
+    def get(self, key, count: bool = True) -> Tuple[bool, object]:
+        with self.lock:
+            hit = self.entries.get(key)
+            if hit is not None and (self.ttl is None or time.monotonic() - hit[0] < self.ttl):
+                self.entries.move_to_end(key)
+                self.hits += count
+                return True, hit[1]
+            if hit is not None:
+                del self.entries[key]
+                self.evictions += 1
+            self.misses += count
+            return False, None
+
+    def put(self, key, value):
+        with self.lock:
+            self.entries[key] = (time.monotonic(), value)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+    def stats(self) -> Dict:
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                "cache": self.name,
+                "entries": f"{len(self.entries)}/{self.max_entries}",
+                "ttl (s)": "—" if self.ttl is None else int(self.ttl),
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit rate": f"{self.hits / lookups:.0%}" if lookups else "—",
+            }
+
+@st.cache_resource(show_spinner=False)
+def _bounded_caches() -> Dict[str, BoundedCache]:
+    return {}
+
+def bounded_cache(max_entries: int = 256, ttl: Optional[float] = None, copy_result: bool = False):
+    """
+    Memoize a pure function process-wide. Arguments named with a leading
+    underscore are not part of the key (same convention as st.cache_data).
+    """
+    def deco(fn):
+        sig = inspect.signature(fn)
+        keyed = [i for i, p in enumerate(sig.parameters) if not p.startswith("_")]
+        name = fn.__qualname__
+        resolved: List[BoundedCache] = []  # the process-wide cache, looked up once per script run
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not resolved:
+                registry = _bounded_caches()
+                resolved.append(registry.setdefault(name, BoundedCache(name, max_entries, ttl)))
+            cache = resolved[0]
+            if kwargs:
+                bound = sig.bind(*args, **kwargs)
+                bound.apply_defaults()
+                args, kwargs = tuple(bound.arguments.values()), {}
+            key = tuple(args[i] for i in keyed if i < len(args))
+            hit, value = cache.get(key)
+            if not hit:
+                def _build():
+                    hit, value = cache.get(key, count=False)  # a run that just finished may have stored it
+                    if not hit:
+                        value = fn(*args, **kwargs)
+                        cache.put(key, value)
+                    return value
+                value = single_flight().run((name, key), _build)
+            return copy.deepcopy(value) if copy_result else value
+
+        return wrapper
+    return deco
+
+def bounded_cache_stats() -> List[Dict]:
+    return [c.stats() for c in _bounded_caches().values()]
+
 # =============================================================================
 # Cached web fetchers
 # =============================================================================
-@st.cache_data(show_spinner=False)
-def fetch_text(url: str) -> str:
+# On-disk response cache shared by restarts and replicas on the same volume.
+# Each URL gets <sha1>.body + <sha1>.json (validators, checksum, timestamps).
+CACHE_DIR = os.getenv("FRLG_CACHE_DIR") or os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), ".frlg_cache"
+)
+HTTP_CACHE_DIR = os.getenv("FRLG_HTTP_CACHE_DIR") or os.path.join(CACHE_DIR, "http")
+HTTP_CACHE_ENABLED = os.getenv("FRLG_HTTP_CACHE", "1") != "0"
+HTTP_CACHE_MAX_BYTES = int(os.getenv("FRLG_HTTP_CACHE_MAX_MB", "64")) * 1024 * 1024
+
+# Seconds a cached body is served without asking upstream; first prefix wins.
+# Past the TTL we revalidate with If-None-Match / If-Modified-Since.
+HTTP_CACHE_TTL = [
+    ("https://docs.google.com/", 10 * 60),
+    ("https://play.pokemonshowdown.com/", 24 * 3600),
+    ("https://cdn.jsdelivr.net/", 7 * 24 * 3600),
+]
+HTTP_CACHE_DEFAULT_TTL = 3600
+# last_access only orders eviction, so a hit rewrites the meta file at most this often
+HTTP_CACHE_TOUCH_INTERVAL = 10 * 60
+
+@st.cache_resource(show_spinner=False)
+def _http_cache_lock() -> threading.Lock:
+    return threading.Lock()
+
+class _HttpCacheIndex:
+    """
+    Size and last access of every cache entry, read from the meta files once
+    per process and kept current by this process's hits, stores and drops.
+    Entries other replicas on the volume wrote are picked up by a rescan
+    before evicting, at most every HTTP_CACHE_TOUCH_INTERVAL seconds.
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.entries: Dict[str, Tuple[float, int]] = {}  # url -> (last_access, size)
+        self.total = 0
+        self.scanned = False
+        self.scanned_at = 0.0
+
+    def scan(self):
+        entries: Dict[str, Tuple[float, int]] = {}
+        try:
+            names = os.listdir(HTTP_CACHE_DIR)
+        except OSError:
+            names = []
+        for fn in names:
+            if not fn.endswith(".json"):
+                continue
+            try:
+                with open(os.path.join(HTTP_CACHE_DIR, fn), "r", encoding="utf-8") as f:
+                    meta = json.load(f)
+                entries[meta["url"]] = (float(meta.get("last_access", 0)), int(meta.get("size", 0)))
+            except (OSError, ValueError, KeyError, TypeError):
+                continue
+        with self.lock:
+            for url, (access, size) in entries.items():
+                # hits in this process may be newer than what the meta file says
+                entries[url] = (max(access, self.entries.get(url, (0.0, 0))[0]), size)
+            self.entries = entries
+            self.total = sum(size for _, size in entries.values())
+            self.scanned = True
+            self.scanned_at = time.monotonic()
+
+    def put(self, url: str, last_access: float, size: int):
+        with self.lock:
+            old = self.entries.get(url)
+            self.entries[url] = (last_access, size)
+            self.total += size - (old[1] if old else 0)
+
+    def discard(self, url: str):
+        with self.lock:
+            old = self.entries.pop(url, None)
+            if old:
+                self.total -= old[1]
+
+@st.cache_resource(show_spinner=False)
+def _http_cache_index() -> _HttpCacheIndex:
+    return _HttpCacheIndex()
+
+def _http_cache_ttl(url: str) -> int:
+    for prefix, ttl in HTTP_CACHE_TTL:
+        if url.startswith(prefix):
+            return ttl
+    return HTTP_CACHE_DEFAULT_TTL
+
+def _http_cache_paths(url: str) -> Tuple[str, str]:
+    h = hashlib.sha1(url.encode("utf-8")).hexdigest()
+    return os.path.join(HTTP_CACHE_DIR, h + ".body"), os.path.join(HTTP_CACHE_DIR, h + ".json")
+
+def _atomic_write_bytes(path: str, data: bytes):
+    tmp = f"{path}.{uuid.uuid4().hex}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+def _http_cache_drop(url: str):
+    for path in _http_cache_paths(url):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+    _http_cache_index().discard(url)
+
+def _http_cache_read(url: str) -> Tuple[Optional[Dict], Optional[bytes]]:
+    """Return (meta, body) for a cached URL, or (None, None) if absent or corrupt."""
+    if not HTTP_CACHE_ENABLED:
+        return None, None
+    body_p, meta_p = _http_cache_paths(url)
+    try:
+        with open(meta_p, "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        with open(body_p, "rb") as f:
+            body = f.read()
+    except (OSError, ValueError):
+        return None, None
+    # Integrity: a torn write or a bit-flipped file must never be served
+    if (meta.get("url") != url or meta.get("size") != len(body)
+            or meta.get("sha256") != hashlib.sha256(body).hexdigest()):
+        _http_cache_drop(url)
+        return None, None
+    return meta, body
+
+def _http_cache_write_meta(url: str, meta: Dict):
+    try:
+        _atomic_write_bytes(_http_cache_paths(url)[1], json.dumps(meta).encode("utf-8"))
+    except OSError:
+        pass
+
+def _http_cache_touch(url: str, meta: Dict, now: float):
+    index = _http_cache_index()
+    if index.scanned:
+        index.put(url, now, int(meta.get("size", 0)))
+    if now - float(meta.get("last_access", 0)) >= HTTP_CACHE_TOUCH_INTERVAL:
+        meta["last_access"] = now
+        _http_cache_write_meta(url, meta)
+
+def _http_cache_evict():
+    """Drop least-recently-used entries until the cache fits HTTP_CACHE_MAX_BYTES."""
+    index = _http_cache_index()
+    if index.total <= HTTP_CACHE_MAX_BYTES:
+        return
+    if time.monotonic() - index.scanned_at >= HTTP_CACHE_TOUCH_INTERVAL:
+        index.scan()  # pick up other replicas' entries
+    with index.lock:
+        lru = sorted((access, url) for url, (access, _) in index.entries.items())
+    for _, url in lru:
+        if index.total <= HTTP_CACHE_MAX_BYTES:
+            break
+        _http_cache_drop(url)
+
+def _http_cache_meta(url: str, size: int, sha: str, etag: Optional[str], last_modified: Optional[str],
+                     now: float) -> Dict:
+    return {
+        "url": url,
+        "etag": etag,
+        "last_modified": last_modified,
+        "fetched_at": now,
+        "last_access": now,
+        "size": size,
+        "sha256": sha,
+    }
+
+def _http_cache_commit(url: str, meta: Dict):
+    # under _http_cache_lock(), once the body is in place
+    _http_cache_write_meta(url, meta)
+    index = _http_cache_index()
+    if index.scanned:
+        index.put(url, meta["last_access"], meta["size"])
+    else:
+        index.scan()  # once per process; the entry just written is on disk
+    _http_cache_evict()
+
+def _http_cache_store(url: str, body: bytes, etag: Optional[str], last_modified: Optional[str]):
+    if not HTTP_CACHE_ENABLED:
+        return
+    meta = _http_cache_meta(url, len(body), hashlib.sha256(body).hexdigest(), etag, last_modified, time.time())
+    with _http_cache_lock():
+        try:
+            os.makedirs(HTTP_CACHE_DIR, exist_ok=True)
+            _atomic_write_bytes(_http_cache_paths(url)[0], body)
+            _http_cache_commit(url, meta)
+        except OSError:
+            pass  # read-only volume: behave like an uncached fetch
+
+def _http_cache_read_file(url: str) -> Tuple[Optional[Dict], Optional[Tuple[str, str]]]:
+    """_http_cache_read for fetch_file: (meta, (body path, sha256)), the body checked in chunks."""
+    if not HTTP_CACHE_ENABLED:
+        return None, None
+    body_p, meta_p = _http_cache_paths(url)
+    try:
+        with open(meta_p, "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        size, sha = os.path.getsize(body_p), _file_sha(body_p)
+    except (OSError, ValueError):
+        return None, None
+    if meta.get("url") != url or meta.get("size") != size or meta.get("sha256") != sha:
+        _http_cache_drop(url)
+        return None, None
+    return meta, (body_p, sha)
+
+def _http_cache_store_stream(url: str, response) -> Tuple[str, str]:
+    """Copy a response into the cache chunk by chunk; (body path, sha256). Raises OSError if it can't."""
+    body_p = _http_cache_paths(url)[0]
+    os.makedirs(HTTP_CACHE_DIR, exist_ok=True)
+    tmp = f"{body_p}.{uuid.uuid4().hex}.tmp"
+    h, size = hashlib.sha256(), 0
+    try:
+        with open(tmp, "wb") as f:
+            for chunk in iter(lambda: response.read(1 << 16), b""):
+                h.update(chunk)
+                size += len(chunk)
+                f.write(chunk)
+        meta = _http_cache_meta(url, size, h.hexdigest(), response.headers.get("ETag"),
+                                response.headers.get("Last-Modified"), time.time())
+        with _http_cache_lock():
+            os.replace(tmp, body_p)
+            _http_cache_commit(url, meta)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+    return body_p, meta["sha256"]
+
+def _cached_get(url: str, timeout: float, revalidate: bool, read, on_response):
+    """
+    The conditional-GET flow behind fetch_text and fetch_file. read(url) gives
+    (meta, value) for the cached copy or (None, None); on_response(url, r)
+    stores a 200 response and returns its value.
+    """
+    meta, held = read(url)
+    now = time.time()
+    if (meta is not None and not revalidate
+            and now - float(meta.get("fetched_at", 0)) < _http_cache_ttl(url)):
+        _http_cache_touch(url, meta, now)
+        return held
+
+    headers = {"User-Agent":"Mozilla/5.0"}
+    if meta is not None:
+        if meta.get("etag"):
+            headers["If-None-Match"] = meta["etag"]
+        if meta.get("last_modified"):
+            headers["If-Modified-Since"] = meta["last_modified"]
     ctx = ssl.create_default_context()
-    req = urllib.request.Request(url, headers={"User-Agent":"Mozilla/5.0"})
-    with urllib.request.urlopen(req, context=ctx, timeout=60) as r:
-        return decode_bytes(r.read())
+    req = urllib.request.Request(url, headers=headers)
+    try:
+        with urllib.request.urlopen(req, context=ctx, timeout=timeout) as r:
+            return on_response(url, r)
+    except urllib.error.HTTPError as e:
+        if meta is None:
+            raise
+        if e.code == 304:
+            meta["fetched_at"] = meta["last_access"] = now
+            _http_cache_write_meta(url, meta)
+            _http_cache_touch(url, meta, now)
+        return held
+    except Exception:
+        if meta is None:
+            raise
+        return held
 
-@st.cache_data(show_spinner=False)
-def fetch_json(url: str) -> dict:
-    return json.loads(fetch_text(url))
+def _store_response_body(url: str, r) -> bytes:
+    fresh = r.read()
+    _http_cache_store(url, fresh, r.headers.get("ETag"), r.headers.get("Last-Modified"))
+    return fresh
+
+def fetch_text(url: str, timeout: float = 60, revalidate: bool = False) -> str:
+    """
+    GET `url` through the on-disk cache.
+    Fresh entries are served from disk, stale ones are revalidated with a
+    conditional GET, and upstream failures fall back to the stale copy.
+    revalidate=True treats every cached entry as stale.
+    """
+    return decode_bytes(_cached_get(url, timeout, revalidate, _http_cache_read, _store_response_body))
+
+def fetch_file(url: str, timeout: float = 60, revalidate: bool = False) -> Tuple[str, str]:
+    """
+    fetch_text for bodies too big to hold in memory: the response is streamed
+    into the on-disk cache and (path of the cached body, sha256) is returned.
+    Needs HTTP_CACHE_ENABLED and a writable HTTP_CACHE_DIR.
+    """
+    return _cached_get(url, timeout, revalidate, _http_cache_read_file, _http_cache_store_stream)
+
+# =============================================================================
+# Data sources (bundled Data/*.json first, network only when asked)
+# =============================================================================
+# FRLG_DATA_SOURCE:
+#   "local"              → bundled files (default); only an optional dataset
+#                          with no bundled copy (gen3) is downloaded, through
+#                          the HTTP cache, and skipped if that fails
+#   "remote"             → always download (the old behaviour)
+#   "local-then-refresh" → boot from the bundled files, then swap in a fresh
+#                          download in the background once it arrives. The swap
+#                          changes the fingerprints, so the species bundle and
+#                          the warm snapshot built from Data/ stop matching.
+DATA_SOURCE_MODES = ("local", "remote", "local-then-refresh")
+DATA_SOURCE_MODE = (os.getenv("FRLG_DATA_SOURCE", "local") or "").strip().lower()
+if DATA_SOURCE_MODE not in DATA_SOURCE_MODES:
+    DATA_SOURCE_MODE = "local"
+DATA_DIR = os.getenv("FRLG_DATA_DIR") or os.path.join(os.path.dirname(os.path.abspath(__file__)), "Data")
+# Unlocks "Refresh changed sources" in Settings → Data sources (unset: no one can)
+ADMIN_TOKEN = os.getenv("FRLG_ADMIN_TOKEN", "")
+
+# name -> where it lives online and which bundled file mirrors it.
+# "optional" datasets degrade to {} instead of failing the boot.
+DATASETS: Dict[str, Dict] = {
+    "pokedex":   {"url": "https://play.pokemonshowdown.com/data/pokedex.json",   "file": "pokedex.json"},
+    "learnsets": {"url": "https://play.pokemonshowdown.com/data/learnsets.json", "file": "learnsets.json"},
+    "moves":     {"url": "https://play.pokemonshowdown.com/data/moves.json",     "file": "moves.json"},
+    "gen3":      {"url": "https://cdn.jsdelivr.net/gh/Deskbot/Pokemon-Learnsets/output/gen3.json",
+                  "file": "gen3.json", "optional": True},
+}
+# Seconds a session waits for a dataset (or the opponents sheet), whether it
+# loads it itself during bootstrap or waits on another session's load.
+BOOTSTRAP_TIMEOUTS = {"pokedex": 60, "learnsets": 90, "gen3": 60, "moves": 60, "opponents": 60}
+
+class _DatasetStore:
+    """Parsed datasets shared by every session of this server process."""
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.data: Dict[str, dict] = {}
+        self.origin: Dict[str, str] = {}   # "local" | "remote" | "missing"
+        self.sha: Dict[str, str] = {}      # sha256 of the raw bytes that were parsed
+        self.refreshing: set = set()
+
+@st.cache_resource(show_spinner=False)
+def _dataset_store_for_process() -> _DatasetStore:
+    return _DatasetStore()
+
+def _dataset_store() -> _DatasetStore:
+    return _run_memo("dataset_store", _dataset_store_for_process)
+
+def _bundled_path(name: str) -> str:
+    return os.path.join(DATA_DIR, DATASETS[name]["file"])
+
+def _read_bundled_json(name: str) -> Tuple[Optional[dict], str]:
+    path = _bundled_path(name)
+    if not os.path.exists(path):
+        return None, ""
+    return _read_dataset_file(name, path)
+
+def _read_dataset_file(name: str, path: str, sha: Optional[str] = None) -> Tuple[dict, str]:
+    """(data, sha256 of the file) for a bundled or downloaded copy of `name`."""
+    keep = DATASET_FILTERS.get(name)
+    if keep is None:
+        with open(path, "rb") as f:
+            raw = f.read()
+        return json.loads(decode_bytes(raw)), hashlib.sha256(raw).hexdigest()
+
+    # Filtered datasets never hold the raw file in memory: hash it in chunks,
+    # reuse the slim copy from an earlier boot, else stream-parse and save one.
+    sha = sha or _file_sha(path)
+    data = _slim_cache_read(name, sha)
+    if data is None:
+        with open(path, "rb") as f:
+            data = keep(_iter_json_object_items(io.TextIOWrapper(f, encoding="utf-8-sig")))
+        _slim_cache_write(name, sha, data)
+    return data, sha
+
+def _parse_dataset_text(name: str, text: str) -> dict:
+    keep = DATASET_FILTERS.get(name)
+    if keep is None:
+        return json.loads(text)
+    return keep(_iter_json_object_items(io.StringIO(text.lstrip("\ufeff"))))
+
+def _download_dataset(name: str, revalidate: bool = False) -> Tuple[str, Callable[[], dict]]:
+    """
+    (sha256 of the downloaded copy, parse it). Filtered datasets are streamed
+    into the HTTP cache and parsed from that file in chunks, like the bundled
+    copy, so the body is never held in memory.
+    """
+    url = DATASETS[name]["url"]
+    if name in DATASET_FILTERS and HTTP_CACHE_ENABLED:
+        try:
+            path, sha = fetch_file(url, revalidate=revalidate)
+        except OSError:
+            pass  # read-only cache volume: download into memory instead
+        else:
+            return sha, lambda: _read_dataset_file(name, path, sha)[0]
+    text = fetch_text(url, revalidate=revalidate)
+    return _text_sha(text), lambda: _parse_dataset_text(name, text)
+
+def _text_sha(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+def _file_sha(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+def _iter_json_object_items(stream, chunk_size: int = 1 << 16):
+    """
+    Yield (key, value) for each member of the top-level JSON object in the
+    text `stream`, reading it in chunks. Only the current value and one
+    chunk are resident, never the whole document.
+    """
+    dec = json.JSONDecoder()
+    buf, pos, eof = "", 0, False
+
+    def _more():
+        nonlocal buf, pos, eof
+        chunk = stream.read(chunk_size)
+        eof = not chunk
+        buf, pos = buf[pos:] + chunk, 0
+
+    def _peek() -> str:
+        nonlocal pos
+        while True:
+            while pos < len(buf) and buf[pos] in " \t\r\n":
+                pos += 1
+            if pos < len(buf) or eof:
+                return buf[pos:pos + 1]
+            _more()
+
+    def _value():
+        nonlocal pos
+        while True:
+            try:
+                val, end = dec.raw_decode(buf, pos)
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+                _more()
+                continue
+            nxt = end
+            while nxt < len(buf) and buf[nxt] in " \t\r\n":
+                nxt += 1
+            if not eof and (nxt >= len(buf) or buf[nxt] not in ",:}"):
+                _more()  # a number may continue in the next chunk
+                continue
+            pos = end
+            return val
+
+    if _peek() != "{":
+        raise ValueError("expected a JSON object")
+    pos += 1
+    if _peek() == "}":
+        return
+    while True:
+        key = _value()
+        if _peek() != ":":
+            raise ValueError(f"expected ':' after {key!r}")
+        pos += 1
+        _peek()
+        yield key, _value()
+        sep = _peek()
+        pos += 1
+        if sep == "}":
+            return
+        if sep != ",":
+            raise ValueError(f"expected ',' or '}}' after {key!r}")
+        _peek()
+
+# Gen 3 is all this app reads from the Showdown learnsets; the full file also
+# carries Gens 4-9 sources, event data and ~830 entries outside the dex.
+GEN3_MAXDEX = 386
+
+def _is_gen3_source(src) -> bool:
+    return isinstance(src, str) and (src.startswith("3L") or src == "3M" or src == "3T")
+
+def _gen3_learnsets(items) -> dict:
+    """Keep only 3L*/3M/3T sources for species #1-386 (formes included)."""
+    dex = load_dataset("pokedex")
+    out = {}
+    for key, entry in items:
+        num = (dex.get(key) or {}).get("num")
+        if not (isinstance(num, int) and 1 <= num <= GEN3_MAXDEX):
+            continue
+        learnset = {}
+        for mv, srcs in ((entry or {}).get("learnset") or {}).items():
+            gen3 = [t for t in (srcs if isinstance(srcs, list) else [srcs]) if _is_gen3_source(t)]
+            if gen3:
+                learnset[mv] = gen3
+        out[key] = {"learnset": learnset}
+    return out
+
+# Datasets parsed through a streaming filter (and cached slim on disk).
+DATASET_FILTERS = {"learnsets": _gen3_learnsets}
+SLIM_CACHE_VERSION = 1
+
+def _slim_cache_path(name: str) -> str:
+    return os.path.join(CACHE_DIR, f"{name}.slim.json")
+
+def _slim_cache_read(name: str, sha: str) -> Optional[dict]:
+    try:
+        with open(_slim_cache_path(name), "rb") as f:
+            doc = json.loads(f.read())
+    except (OSError, ValueError):
+        return None
+    if (doc.get("version") != SLIM_CACHE_VERSION or doc.get("source_sha") != sha
+            or doc.get("pokedex_sha") != dataset_fingerprint("pokedex")):
+        return None
+    return doc.get("data")
+
+def _slim_cache_write(name: str, sha: str, data: dict):
+    doc = {"version": SLIM_CACHE_VERSION, "source_sha": sha,
+           "pokedex_sha": dataset_fingerprint("pokedex"), "data": data}
+    try:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        _atomic_write_bytes(_slim_cache_path(name), json.dumps(doc, separators=(",", ":")).encode("utf-8"))
+    except OSError:
+        pass  # read-only volume: parse again next boot
+
+def _refresh_dataset_async(name: str):
+    """Download a fresh copy in a daemon thread and swap it in on success."""
+    store = _dataset_store()
+    with store.lock:
+        if name in store.refreshing:
+            return
+        store.refreshing.add(name)
+
+    def _work():
+        try:
+            _install_download(name)
+        except Exception:
+            pass  # offline pods keep the bundled copy
+        finally:
+            with store.lock:
+                store.refreshing.discard(name)
+
+    threading.Thread(target=_work, name=f"frlg-refresh-{name}", daemon=True).start()
+
+def _install_download(name: str, revalidate: bool = False) -> bool:
+    """
+    Download `name` and swap it in unless it hashes the same as the copy
+    loaded. Derived tables are keyed by dataset fingerprints, so they rebuild
+    for the new data on the next run without clearing anything.
+    """
+    store = _dataset_store()
+    sha, parse = _download_dataset(name, revalidate)
+    with store.lock:
+        if store.sha.get(name) == sha:
+            return False
+    fresh = parse()
+    if not isinstance(fresh, dict) or not fresh:
+        raise ValueError(f"{name}: downloaded copy is empty")
+    with store.lock:
+        store.data[name] = fresh
+        store.origin[name] = "remote"
+        store.sha[name] = sha
+    return True
+
+def refresh_datasets(names=None) -> Dict[str, str]:
+    """
+    Revalidate each dataset upstream (conditional GET, so unchanged ones are
+    not downloaded again) and install only those whose content changed.
+    Returns name -> "updated" | "unchanged" | "error: ...".
+    """
+    def _one(name: str) -> str:
+        try:
+            changed = _install_download(name, revalidate=True)
+            return "updated" if changed else "unchanged"
+        except Exception as e:
+            return f"error: {e}"
+
+    names = list(names or DATASETS)
+    with ThreadPoolExecutor(max_workers=len(names), thread_name_prefix="frlg-refresh") as pool:
+        return dict(zip(names, pool.map(_one, names)))
+
+def dataset_status() -> List[Dict]:
+    store = _dataset_store()
+    with store.lock:
+        return [{
+            "dataset": name,
+            "origin": store.origin.get(name, "not loaded"),
+            "fingerprint": (store.sha.get(name) or "—")[:12],
+            "refreshing": "yes" if name in store.refreshing else "",
+        } for name in DATASETS]
+
+def load_dataset(name: str) -> dict:
+    """
+    Return the parsed dataset `name` according to DATA_SOURCE_MODE.
+    The result is shared process-wide; callers must treat it as read-only.
+    """
+    cur = _dataset_store().data.get(name)
+    if cur is not None:
+        return cur
+    return single_flight().run(("dataset", name), lambda: _load_dataset_now(name),
+                               timeout=BOOTSTRAP_TIMEOUTS.get(name))
+
+def _load_dataset_now(name: str) -> dict:
+    store = _dataset_store()
+    cur = store.data.get(name)
+    if cur is not None:
+        return cur  # loaded by a run that finished while we queued
+
+    spec = DATASETS[name]
+    data, origin, sha = None, "missing", ""
+    if DATA_SOURCE_MODE != "remote":
+        data, sha = _read_bundled_json(name)
+        if data is not None:
+            origin = "local"
+    if data is None and (DATA_SOURCE_MODE != "local" or spec.get("optional")):
+        try:
+            sha, parse = _download_dataset(name)
+            data = parse()
+            origin = "remote"
+        except Exception:
+            if not spec.get("optional"):
+                raise
+    if data is None:
+        if not spec.get("optional"):
+            raise FileNotFoundError(f"No bundled copy of {name} at {_bundled_path(name)}")
+        data = {}
+
+    with store.lock:
+        store.data.setdefault(name, data)
+        store.origin.setdefault(name, origin)
+        store.sha.setdefault(name, sha)
+        data = store.data[name]
+    if origin == "local" and DATA_SOURCE_MODE == "local-then-refresh":
+        _refresh_dataset_async(name)
+    return data
+
+def _give_up_on_dataset(name: str):
+    """Boot without an optional dataset; a late download of it is ignored."""
+    store = _dataset_store()
+    with store.lock:
+        store.data.setdefault(name, {})
+        store.origin.setdefault(name, "missing")
+        store.sha.setdefault(name, "")
+
+def dataset_fingerprint(name: str) -> str:
+    """sha256 of the bytes the loaded copy of `name` was parsed from ("" if missing)."""
+    return dataset_with_fingerprint(name)[1]
+
+def dataset_with_fingerprint(name: str) -> Tuple[dict, str]:
+    """(data, fingerprint) read together, so a background refresh can't split them."""
+    load_dataset(name)
+    store = _dataset_store()
+    with store.lock:
+        return store.data[name], store.sha.get(name, "")
 
-@st.cache_data(show_spinner=False)
 def get_pokedex_cached() -> dict:
-    return fetch_json("https://play.pokemonshowdown.com/data/pokedex.json")
+    return load_dataset("pokedex")
 
-@st.cache_data(show_spinner=False)
 def get_showdown_learnsets_cached() -> dict:
-    return fetch_json("https://play.pokemonshowdown.com/data/learnsets.json")
+    return load_dataset("learnsets")
 
-@st.cache_data(show_spinner=False)
 def get_gen3_data_cached() -> dict:
-    return fetch_json("https://cdn.jsdelivr.net/gh/Deskbot/Pokemon-Learnsets/output/gen3.json")
+    return load_dataset("gen3")
 
 # =============================================================================
-# Moves master and learnset helpers
+# Warm-start snapshot
 # =============================================================================
-def load_moves_master():
-    global MOVES_MASTER, MOVES_BY_NAME, MOVES_BY_ID
-    if MOVES_MASTER:
-        return
+# After a bootstrap the derived structures (move registry, the learnsets built
+# so far, parsed encounters per starter) are written as JSON next to the HTTP
+# cache; it is a shared writable directory, so nothing there is unpickled.
+# The next process on the same volume loads them instead of rebuilding, as
+# long as the dataset fingerprints still match. Encounters are reused only
+# when the sheet tabs hash the same as when they were parsed.
+WARM_SNAPSHOT_VERSION = 3
+WARM_SNAPSHOT_ENABLED = os.getenv("FRLG_WARM_SNAPSHOT", "1") != "0"
+WARM_SNAPSHOT_PATH = os.getenv("FRLG_WARM_SNAPSHOT_PATH") or os.path.join(CACHE_DIR, "warm_snapshot.json")
+
+@st.cache_resource(show_spinner=False, max_entries=4)
+def _warm_snapshot_for(fingerprints: Tuple[str, ...]) -> Optional[Dict]:
+    if not WARM_SNAPSHOT_ENABLED:
+        return None
     try:
-        moves = fetch_json("https://play.pokemonshowdown.com/data/moves.json")
+        with open(WARM_SNAPSHOT_PATH, "rb") as f:
+            snap = json.loads(decode_bytes(f.read()))
+        if (not isinstance(snap, dict) or snap.get("version") != WARM_SNAPSHOT_VERSION
+                or tuple(snap.get("sources") or ()) != fingerprints):
+            return None
+        # JSON has no tuples, and no tuple keys
+        snap["learnsets"] = {k: {lv: tuple(mvs) for lv, mvs in v.items()} for k, v in snap["learnsets"].items()}
+        encounters = {}
+        for url, starter, entry in snap["encounters"]:
+            for enc in entry["encounters"]:
+                for m in enc["mons"]:
+                    m["moves"] = [tuple(mv) for mv in m["moves"]]
+            encounters[(url, starter)] = entry
+        snap["encounters"] = encounters
     except Exception:
-        moves = {}
+        return None
+    return snap
+
+def _game_data_fingerprints() -> Tuple[str, ...]:
+    return _run_memo("game_fps", lambda: tuple(dataset_fingerprint(n) for n in DATASETS))
+
+def warm_snapshot() -> Optional[Dict]:
+    """
+    The on-disk snapshot if it was taken from the datasets loaded now, else
+    None (also before the datasets are loaded, so this never triggers a load).
+    """
+    store = _dataset_store()
+    if any(n not in store.data for n in DATASETS):
+        return None
+    return _warm_snapshot_for(_game_data_fingerprints())
+
+@st.cache_resource(show_spinner=False, max_entries=4)
+def _encounter_registry_for(fingerprints: Tuple[str, ...]) -> Dict[Tuple[str, str], Dict]:
+    """(sheet_url, starter) -> {"tabs": {gid: sha}, "encounters": [...]}, seeded from the snapshot."""
+    snap = _warm_snapshot_for(fingerprints)
+    return dict(snap["encounters"]) if snap else {}
+
+def _encounter_registry() -> Dict[Tuple[str, str], Dict]:
+    return _encounter_registry_for(_game_data_fingerprints())
+
+class _SnapshotWriter:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.written: Optional[Tuple] = None  # signature of the last file written
+        self.busy = False
+
+@st.cache_resource(show_spinner=False)
+def _snapshot_writer() -> _SnapshotWriter:
+    return _SnapshotWriter()
+
+def _snapshot_sig(fingerprints: Tuple[str, ...], encounters: Dict, learnsets) -> Tuple:
+    return (fingerprints, tuple(sorted((k, tuple(sorted(v["tabs"].items()))) for k, v in encounters.items())),
+            frozenset(learnsets))
+
+def save_warm_snapshot_async():
+    """
+    Write the snapshot in a daemon thread when it would differ from the one on
+    disk. Only what this process has built goes in: the learnsets sessions
+    have read so far, not every species of both scopes.
+    """
+    if not WARM_SNAPSHOT_ENABLED:
+        return
+    fps = _game_data_fingerprints()
+    registry = dict(_encounter_registry_for(fps))
+    learnsets = dict(_learnset_memo_for(fps))
+    sig = _snapshot_sig(fps, registry, learnsets)
+    writer = _snapshot_writer()
+    with writer.lock:
+        if writer.busy or writer.written == sig:
+            return
+        snap = _warm_snapshot_for(fps)
+        if snap is not None and _snapshot_sig(fps, snap["encounters"], snap["learnsets"]) == sig:
+            writer.written = sig  # the file we booted from is already current
+            return
+        writer.busy = True
+    moves = move_registry().to_rows()
+
+    def _work():
+        try:
+            doc = {
+                "version": WARM_SNAPSHOT_VERSION,
+                "sources": fps,
+                "moves": moves,
+                "learnsets": {k: dict(v) for k, v in learnsets.items()},
+                "encounters": [[url, starter, entry] for (url, starter), entry in registry.items()],
+            }
+            os.makedirs(os.path.dirname(WARM_SNAPSHOT_PATH) or ".", exist_ok=True)
+            _atomic_write_bytes(WARM_SNAPSHOT_PATH, json.dumps(doc, separators=(",", ":")).encode("utf-8"))
+            with writer.lock:
+                writer.written = sig
+        except Exception:
+            pass  # read-only volume or data changed underneath: next boot rebuilds
+        finally:
+            with writer.lock:
+                writer.busy = False
+
+    threading.Thread(target=_work, name="frlg-warm-snapshot", daemon=True).start()
+
+# =============================================================================
+# Name indexes (normalized id -> record), rebuilt once per data load
+# =============================================================================
+class DexIndex:
+    """O(1) pokedex lookups by ps_id of either the dex key or the display name."""
+    def __init__(self, dex: dict):
+        self.dex = dex
+        # ps_id(name) -> non-forme records with an int dex number, in dex order
+        self.base_by_name: Dict[str, List[dict]] = {}
+        for rec in dex.values():
+            if not rec or rec.get("forme") or not isinstance(rec.get("num"), int):
+                continue
+            self.base_by_name.setdefault(ps_id(rec.get("name", "")), []).append(rec)
+
+    def lookup(self, name: str, maxdex: int = 386) -> Optional[dict]:
+        """Non-forme record for `name` with 1 <= num <= maxdex, or None."""
+        sid = ps_id(name)
+        if not sid:
+            return None
+        rec = self.dex.get(sid)
+        if rec and not rec.get("forme") and isinstance(rec.get("num"), int) and 1 <= rec["num"] <= maxdex:
+            return rec
+        for r in self.base_by_name.get(sid, ()):
+            if 1 <= r["num"] <= maxdex:
+                return r
+        return None
+
+def _key_index(keys, norm) -> Dict[str, str]:
+    out: Dict[str, str] = {}
+    for k in keys:
+        out.setdefault(norm(k), k)
+    return out
+
+@st.cache_resource(show_spinner=False, max_entries=4)
+def _dex_index_for(fingerprint: str, _dex: dict) -> DexIndex:
+    return DexIndex(_dex)
+
+@st.cache_resource(show_spinner=False, max_entries=4)
+def _learnset_key_index_for(fingerprint: str, _lsets: dict) -> Dict[str, str]:
+    return _key_index(_lsets.keys(), ps_id)
+
+@st.cache_resource(show_spinner=False, max_entries=4)
+def _gen3_key_index_for(fingerprint: str, _gen3: dict) -> Dict[str, str]:
+    return _key_index(_gen3.keys(), species_key)
+
+def dex_index() -> DexIndex:
+    dex, fp = dataset_with_fingerprint("pokedex")
+    return _run_memo(("dex_index", fp), lambda: _dex_index_for(fp, dex))
+
+def dex_lookup(name: str, maxdex: int = 386) -> Optional[dict]:
+    return dex_index().lookup(name, maxdex)
+
+@st.cache_resource(show_spinner=False, max_entries=4)
+def _species_ids_for(fingerprint: str, maxdex: int, _index: DexIndex) -> FrozenSet[str]:
+    candidates = {k for k in _index.dex if ps_id(k) == k} | set(_index.base_by_name)
+    return frozenset(sid for sid in candidates if _index.lookup(sid, maxdex) is not None)
+
+def species_ids(maxdex: int = 386) -> FrozenSet[str]:
+    """Every ps_id that dex_lookup(name, maxdex) resolves, for set-membership tests."""
+    fp = dataset_fingerprint("pokedex")
+    return _run_memo(("species_ids", maxdex, fp), lambda: _species_ids_for(fp, maxdex, dex_index()))
+
+def learnset_key(name: str) -> Optional[str]:
+    """Showdown learnsets key for a species name (None if it has no entry)."""
+    lsets, fp = dataset_with_fingerprint("learnsets")
+    sid = ps_id(name)
+    if sid in lsets:
+        return sid
+    return _run_memo(("learnset_keys", fp), lambda: _learnset_key_index_for(fp, lsets)).get(sid)
+
+def gen3_key(name: str) -> Optional[str]:
+    """Deskbot gen3 dump key for a species name (None if it has no entry)."""
+    gen3, fp = dataset_with_fingerprint("gen3")
+    sk = species_key(name)
+    if sk in gen3:
+        return sk
+    return _run_memo(("gen3_keys", fp), lambda: _gen3_key_index_for(fp, gen3)).get(sk)
+
+# =============================================================================
+# Moves master and learnset helpers
+# =============================================================================
+class MoveRecord(Mapping):
+    """One move, reduced to the fields this app reads. Read-only."""
+    __slots__ = ("id", "name", "type", "category", "basePower", "is_damaging")
+
+    def __init__(self, id: int, name: str, type: Optional[str], category: str, basePower, is_damaging: bool):
+        self.id = id
+        self.name = name
+        self.type = type
+        self.category = category
+        self.basePower = basePower
+        self.is_damaging = is_damaging
+
+    def __getitem__(self, key):
+        if key in MoveRecord.__slots__:
+            return getattr(self, key)
+        raise KeyError(key)
+
+    def __iter__(self):
+        return iter(MoveRecord.__slots__)
+
+    def __len__(self) -> int:
+        return len(MoveRecord.__slots__)
+
+class MoveRegistry:
+    """Moves by dense integer id; Showdown ids and lowercased names alias to it."""
+    __slots__ = ("records", "ids", "resolved")
+
+    def __init__(self, records: List[MoveRecord], ids: Dict[str, int]):
+        self.records = records
+        self.ids = ids
+        self.resolved: Dict[str, Optional[MoveRecord]] = {}  # raw token -> record, see lookup_move
+
+    def get(self, alias: str) -> Optional[MoveRecord]:
+        i = self.ids.get(alias)
+        return None if i is None else self.records[i]
+
+    def __len__(self) -> int:
+        return len(self.records)
+
+    # Plain rows for the warm snapshot, which is JSON.
+    def to_rows(self) -> Tuple[List[tuple], Dict[str, int]]:
+        return [tuple(getattr(r, k) for k in MoveRecord.__slots__) for r in self.records], dict(self.ids)
+
+    @classmethod
+    def from_rows(cls, rows: List[tuple], ids: Dict[str, int]) -> "MoveRegistry":
+        return cls([MoveRecord(*row) for row in rows], ids)
+
+def build_move_registry(moves: dict) -> MoveRegistry:
+    records: List[MoveRecord] = []
+    by_id: Dict[str, int] = {}
+    by_name: Dict[str, int] = {}
     for mid, md in moves.items():
         name = md.get("name", mid)
         mid_showdown = md.get("id", mid)
-        mtype = normalize_type(md.get("type",""))
         cat = md.get("category","")
         bp = md.get("basePower",0)
         is_dmg = (cat.lower()!="status") or (isinstance(bp,(int,float)) and bp>0) or ("damage" in md) or ("ohko" in md)
-        rec = {**md, "name":name, "type":mtype, "category":cat, "basePower":bp, "is_damaging":bool(is_dmg)}
-        MOVES_MASTER[name] = rec
-        MOVES_BY_NAME[norm_key(name)] = rec
-        MOVES_BY_ID[move_id(name)] = rec
+        i = len(records)
+        records.append(MoveRecord(i, name, normalize_type(md.get("type","")), cat, bp, bool(is_dmg)))
+        by_name[norm_key(name)] = i
+        by_id[move_id(name)] = i
         if mid_showdown:
-            MOVES_BY_ID[move_id(mid_showdown)] = rec
+            by_id[move_id(mid_showdown)] = i
+    # Showdown ids are tried first by lookup_move, so they win any clash
+    ids = dict(by_name)
+    ids.update(by_id)
+    return MoveRegistry(records, ids)
+
+@st.cache_resource(show_spinner=False, max_entries=4)
+def _move_registry_for(fingerprint: str, _moves: dict, _rows: Optional[tuple] = None) -> MoveRegistry:
+    # _rows: the warm snapshot's copy of the same registry, which is cheaper to restore than to build
+    if _rows is not None:
+        return MoveRegistry.from_rows(*_rows)
+    return build_move_registry(_moves)
 
-load_moves_master()
+def load_moves_master():
+    # Bootstrap calls this once every dataset is in, so a warm process restores
+    # the registry from the snapshot; anything earlier builds it.
+    global MOVES
+    if MOVES is not None:
+        return
+    try:
+        moves, fp = dataset_with_fingerprint("moves")
+    except Exception:
+        moves, fp = {}, ""
+    snap = warm_snapshot()
+    rows = snap["moves"] if snap else None
+    MOVES = _run_memo(("moves", fp), lambda: _move_registry_for(fp, moves, rows))
 
-def lookup_move(s: str) -> Optional[Dict]:
-    if not s: return None
+def move_registry() -> MoveRegistry:
+    if MOVES is None:
+        load_moves_master()
+    return MOVES
+
+def _resolve_move_token(s: str) -> Optional[MoveRecord]:
     s_clean = clean_move_token(s)
-    return MOVES_BY_ID.get(move_id(s_clean)) or MOVES_BY_NAME.get(norm_key(s_clean))
+    moves = move_registry()
+    return moves.get(move_id(s_clean)) or moves.get(norm_key(s_clean))
+
+def lookup_move(s: str) -> Optional[MoveRecord]:
+    if not s: return None
+    # The memo lives on the registry, so a new moves dataset starts a fresh one
+    memo = move_registry().resolved
+    try:
+        return memo[s]
+    except KeyError:
+        pass
+    rec = _resolve_move_token(s)
+    if len(memo) >= TOKEN_MEMO_MAX:
+        memo.clear()
+    memo[s] = rec
+    return rec
 
 def move_is_damaging(move_name: str) -> bool:
     info = lookup_move(move_name)
@@ -1521,99 +2592,190 @@ def _apply_frlg_overrides(species_name: str, levelmap: Dict[str, List[str]]) ->
     return clean
 
 
-def rebuild_learnset_for(species_name: str) -> Dict[str, List[str]]:
-    out: Dict[str, List[str]] = {}
-    gen3 = get_gen3_data_cached()
-    keys = list(gen3.keys())
-    sk = species_key(species_name)
-    gk = sk if sk in gen3 else next((k for k in keys if species_key(k) == sk), None)
-
-    # 1) Base: FR/LG-aligned Gen3 level-up dump (your existing logic)
-    if gk and isinstance(gen3.get(gk, {}).get("level", {}), dict):
-        for lv, mv in gen3[gk]["level"].items():
-            seq = mv if isinstance(mv, list) else [mv]
-            for m in seq:
-                rec = lookup_move(m)
-                nm = rec["name"] if rec else clean_move_token(m)
-                if nm and move_is_damaging(nm):
-                    _merge_into_levelmap(out, int(re.sub(r"\D","",str(lv)) or "0"), nm)
+def _gen3_levelup_pairs(entry: dict) -> List[Tuple[int, str]]:
+    """(level, move) for the damaging moves of one gen3-dump entry, in dump order."""
+    pairs = []
+    level = (entry or {}).get("level", {})
+    if not isinstance(level, dict):
+        return pairs
+    for lv, mv in level.items():
+        seq = mv if isinstance(mv, list) else [mv]
+        for m in seq:
+            rec = lookup_move(m)
+            nm = rec["name"] if rec else clean_move_token(m)
+            if nm and move_is_damaging(nm):
+                pairs.append((int(_NON_DIGIT_RE.sub("",str(lv)) or "0"), nm))
+    return pairs
+
+def _showdown_levelup_pairs(learn: dict) -> List[Tuple[int, str]]:
+    """(level, move) for the damaging Gen 3 level-up (3Lxx) moves of one Showdown learnset."""
+    pairs = []
+    for move_id_key, sources in (learn or {}).items():
+        if not isinstance(sources, list):
+            continue
+        levels = []
+        for s in sources:
+            m = _GEN3_LEVELUP_RE.match(str(s))
+            if m:
+                levels.append(int(m.group(1)))
+        if not levels:
+            continue
+        rec = move_registry().get(move_id(move_id_key))
+        nm = rec["name"] if rec else clean_move_token(move_id_key)
+        if not nm or not move_is_damaging(nm):
+            continue
+        pairs.extend((lv, nm) for lv in levels)
+    return pairs
 
-    # 2) Merge-in Pokémon Showdown only for Gen 3 level-up (3Lxx)
-    ls = get_showdown_learnsets_cached()
-    showdown_key = None
-    nsk = ps_id(species_name)
-    if nsk in ls:
-        showdown_key = nsk
-    else:
-        for k in ls.keys():
-            if ps_id(k) == nsk:
-                showdown_key = k
-                break
-    if showdown_key:
-        learn = ls[showdown_key].get("learnset", {})
-        for move_id_key, sources in learn.items():
-            if not isinstance(sources, list):
-                continue
-            levels = []
-            for s in sources:
-                m = re.match(r"^3L(\d+)$", str(s))
-                if m:
-                    levels.append(int(m.group(1)))
-            if not levels:
-                continue
-            rec = MOVES_BY_ID.get(move_id(move_id_key))
-            nm = rec["name"] if rec else clean_move_token(move_id_key)
-            if not nm or not move_is_damaging(nm):
-                continue
-            for lv in levels:
-                _merge_into_levelmap(out, lv, nm)
+def _merged_levelmap(*pair_lists: List[Tuple[int, str]]) -> Dict[str, List[str]]:
+    out: Dict[str, List[str]] = {}
+    for pairs in pair_lists:
+        for lv, nm in pairs:
+            _merge_into_levelmap(out, lv, nm)
+    return out
 
-    # 3) Apply FR/LG species-specific removals (e.g., strip Rage from the Charmander line)
-    rm = FRLG_REMOVE_MOVES.get(ps_id(species_name), set())
-    if rm:
+def _apply_frlg_levelup_fixes(out: Dict[str, List[str]], remove: set, l1_moves: List[str]):
+    # FR/LG removals first (e.g. strip Rage from the Charmander line), then the
+    # L1 overrides for the legendary birds (so Articuno gets Gust/Powder Snow at Lv1)
+    if remove:
         for k in list(out.keys()):
-            out[k] = [m for m in out[k] if m not in rm]
+            out[k] = [m for m in out[k] if m not in remove]
             if not out[k]:
                 del out[k]
+    for name in l1_moves or ():
+        _merge_into_levelmap(out, 1, name)
 
-    # 4) Enforce FR/LG L1 overrides for legendary birds (so Articuno gets Gust/Powder Snow at Lv1)
-    ov = FRLG_L1_OVERRIDES.get(ps_id(species_name))
-    if ov:
-        for name in ov:
-            _merge_into_levelmap(out, 1, name)
+def rebuild_learnset_for(species_name: str) -> Dict[str, List[str]]:
+    bundle = species_bundle()
+    if bundle is not None:
+        sid = bundle["index"].get(species_key(species_name))
+        if sid is not None:
+            return _bundle_levelmap(bundle, sid)
+
+    # Base: FR/LG-aligned Gen3 level-up dump, then Pokémon Showdown's Gen 3 level-up
+    gen3 = get_gen3_data_cached()
+    gk = gen3_key(species_name)
+    ls = get_showdown_learnsets_cached()
+    showdown_key = learnset_key(species_name)
+    out = _merged_levelmap(
+        _gen3_levelup_pairs(gen3[gk]) if gk else [],
+        _showdown_levelup_pairs(ls[showdown_key].get("learnset", {})) if showdown_key else [],
+    )
+    pid = ps_id(species_name)
+    _apply_frlg_levelup_fixes(out, FRLG_REMOVE_MOVES.get(pid, set()), FRLG_L1_OVERRIDES.get(pid))
 
     # keep only non-empty levels
     return {k: v for k, v in out.items() if v}
 
+def rebuild_learnsets_for(names) -> Dict[str, Dict[str, List[str]]]:
+    """
+    rebuild_learnset_for over many species at once, keyed by species_key.
+    Each gen3 and Showdown entry is resolved once however many names map to
+    it, and the FR/LG fixes run as one pass over their own (small) tables.
+    """
+    bundle = species_bundle()
+    gen3 = get_gen3_data_cached()
+    ls = get_showdown_learnsets_cached()
+    gen3_pairs: Dict[str, List[Tuple[int, str]]] = {}
+    showdown_pairs: Dict[str, List[Tuple[int, str]]] = {}
+    out: Dict[str, Dict[str, List[str]]] = {}
+    by_pid: Dict[str, List[Dict[str, List[str]]]] = {}
+    for name in names:
+        sk = species_key(name)
+        if sk in out:
+            continue
+        sid = bundle["index"].get(sk) if bundle is not None else None
+        if sid is not None:
+            out[sk] = _bundle_levelmap(bundle, sid)
+            continue
+        gk = gen3_key(name)
+        if gk and gk not in gen3_pairs:
+            gen3_pairs[gk] = _gen3_levelup_pairs(gen3[gk])
+        lk = learnset_key(name)
+        if lk and lk not in showdown_pairs:
+            showdown_pairs[lk] = _showdown_levelup_pairs(ls[lk].get("learnset", {}))
+        out[sk] = _merged_levelmap(gen3_pairs.get(gk, ()), showdown_pairs.get(lk, ()))
+        by_pid.setdefault(ps_id(name), []).append(out[sk])
+
+    for pid in set(FRLG_REMOVE_MOVES) | set(FRLG_L1_OVERRIDES):
+        for lm in by_pid.get(pid, ()):
+            _apply_frlg_levelup_fixes(lm, FRLG_REMOVE_MOVES.get(pid, set()), FRLG_L1_OVERRIDES.get(pid))
+    return out
+
+class LevelIndex:
+    """
+    A learnset flattened for level queries: damaging moves, resolved to their
+    canonical names, each at the first level it is learned, sorted by level
+    (ties keep learnset order).
+    """
+    __slots__ = ("levels", "moves")
 
+    def __init__(self, levels: List[int], moves: Tuple[str, ...]):
+        self.levels = levels
+        self.moves = moves
 
-def last_four_moves_by_level(learnset: Dict[str, List[str]], level: int) -> List[str]:
+    def known_at(self, level: int, n: int = 4) -> List[str]:
+        """The last `n` moves learned at or below `level`, oldest first."""
+        i = bisect.bisect_right(self.levels, level)
+        return list(self.moves[max(0, i - n):i])
+
+def build_level_index(learnset: Mapping) -> LevelIndex:
     entries = []
     for k, v in learnset.items():
         num = ''.join([c for c in str(k) if c.isdigit()])
         if not num: continue
-        lv = int(num)
-        if lv <= level:
-            seq = v if isinstance(v, list) else [v]
-            for m in seq:
-                nm = (lookup_move(m) or {}).get("name", clean_move_token(m))
-                if nm and move_is_damaging(nm):
-                    entries.append((lv, nm))
-    entries = [(lv, mv, i) for i, (lv, mv) in enumerate(entries)]
-    entries.sort(key=lambda p: (p[0], p[2]))
-    seen, ordered = set(), []
-    for lv, mv, _ in entries:
+        seq = v if isinstance(v, (list, tuple)) else [v]
+        for m in seq:
+            nm = (lookup_move(m) or {}).get("name", clean_move_token(m))
+            if nm and move_is_damaging(nm):
+                entries.append((int(num), nm))
+    entries.sort(key=lambda p: p[0])  # stable: same-level moves keep learnset order
+    # A move's first level is the only one that matters: at any level below it
+    # the move isn't known, at any level above it the earlier entry wins.
+    seen, levels, moves = set(), [], []
+    for lv, mv in entries:
         if mv in seen: continue
-        seen.add(mv); ordered.append(mv)
-    return ordered[-4:]
+        seen.add(mv); levels.append(lv); moves.append(mv)
+    return LevelIndex(levels, tuple(moves))
+
+class LevelLearnset(Mapping):
+    """Read-only level -> moves map that keeps its LevelIndex once built."""
+    __slots__ = ("_levels", "_index")
+
+    def __init__(self, levels: Dict[str, Tuple[str, ...]]):
+        self._levels = levels
+        self._index = None
+
+    @property
+    def index(self) -> LevelIndex:
+        if self._index is None:
+            self._index = build_level_index(self._levels)
+        return self._index
+
+    def __getitem__(self, key):
+        return self._levels[key]
+
+    def __iter__(self):
+        return iter(self._levels)
+
+    def __len__(self) -> int:
+        return len(self._levels)
+
+def level_index(learnset: Mapping) -> LevelIndex:
+    if isinstance(learnset, LevelLearnset):
+        return learnset.index
+    return build_level_index(learnset or {})  # session-only species keep plain dicts
+
+def last_four_moves_by_level(learnset: Dict[str, List[str]], level: int) -> List[str]:
+    return level_index(learnset).known_at(level)
 
 def ensure_move_in_db(move_name: str, default_type: Optional[str]=None):
     if not move_name: return
     mk = norm_key(clean_move_token(move_name))
-    if mk and mk not in STATE["moves_db"]:
+    if mk and mk not in moves_db():
         info = lookup_move(move_name)
         mtype = normalize_type((info.get("type") if info else None) or (default_type or ""))
-        STATE["moves_db"][mk] = {"name":clean_move_token(move_name),"type":mtype}
+        moves_db()[mk] = {"name":clean_move_token(move_name),"type":mtype}
 
 # =============================================================================
 # Species building
@@ -1631,54 +2793,127 @@ def is_kanto_base_for_151(sd: dict, dex: dict) -> bool:
     pnum = pre.get("num") if pre else None
     return not (isinstance(pnum, int) and 1 <= pnum <= 151)
 
-@st.cache_data(show_spinner=False)
-def build_state_from_web_cached(maxdex: int) -> Dict:
-    pokedex = get_pokedex_cached()
-
-    moves_db = {}
-    for rec in MOVES_MASTER.values():
-        moves_db[norm_key(rec["name"])] = {
-            "name": rec["name"],
-            "type": normalize_type(rec.get("type", "")),
-            "meta": {"species_scope": str(maxdex)}
-        }
+# Every session used to hold its own copy of these tables (~1-2 MB each). They are
+# identical for a given scope and data version, so one read-only copy is built per
+# process and shared; STATE["species_db"] / STATE["moves_db"] now only hold the
+# session's own additions (sheet-only species, moves seen on opponents, ...).
+#
+# Species records are cheap (name/types/total); the learnset behind each one is
+# built the first time something reads it and then memoized for the process.
+@st.cache_resource(show_spinner=False, max_entries=4)
+def _learnset_memo_for(fingerprints: Tuple[str, ...]) -> Dict[str, Mapping]:
+    snap = _warm_snapshot_for(fingerprints)
+    if not snap:
+        return {}
+    return {k: LevelLearnset(v) for k, v in snap["learnsets"].items()}
+
+def shared_learnset(name: str) -> Mapping:
+    """Read-only level-up learnset for `name`, built once per process and data version."""
+    fps = _game_data_fingerprints()
+    memo = _run_memo(("learnset_memo", fps), lambda: _learnset_memo_for(fps))
+    key = species_key(name)
+    ls = memo.get(key)
+    if ls is None:
+        built = rebuild_learnset_for(name) or {}
+        ls = memo.setdefault(key, LevelLearnset({k: tuple(v) for k, v in built.items()}))
+    return ls
+
+class SpeciesRecord(Mapping):
+    """Read-only species entry; "learnset" is resolved on first access."""
+    __slots__ = ("name", "types", "total", "_learnset")
+    _KEYS = ("name", "types", "total", "learnset")
+
+    def __init__(self, name: str, types: Tuple[str, str], total: int):
+        self.name = name
+        self.types = types
+        self.total = total
+        self._learnset = None
+
+    @property
+    def learnset(self) -> Mapping:
+        if self._learnset is None:
+            self._learnset = shared_learnset(self.name)
+        return self._learnset
+
+    def __getitem__(self, key):
+        if key == "learnset":
+            return self.learnset
+        if key in ("name", "types", "total"):
+            return getattr(self, key)
+        raise KeyError(key)
+
+    def __iter__(self):
+        return iter(self._KEYS)
+
+    def __len__(self) -> int:
+        return len(self._KEYS)
+
+def _scope_species(maxdex: int) -> Dict[str, SpeciesRecord]:
+    """Base species for one dex scope, without learnsets."""
+    out: Dict[str, SpeciesRecord] = {}
+    bundle = species_bundle()
+    if bundle is not None and maxdex in bundle["scopes"]:
+        for i in bundle["scopes"][maxdex]:
+            key, name, _, t1, t2, total, _, _ = bundle["species"][i]
+            out[key] = SpeciesRecord(name, (t1, t2), total)
+        return out
 
-    species_db = {}
+    pokedex = get_pokedex_cached()
     for sid, sd in pokedex.items():
         if not is_base_for_scope(sd, pokedex, maxdex):
             continue
-
         name = sd.get("name", sid)
-        types_raw = sd.get("types", [])
-        t1, t2 = purge_fairy_types_pair(types_raw)
+        t1, t2 = purge_fairy_types_pair(sd.get("types", []))
         base = sd.get("baseStats", {})
         total = int(sum(base.values())) if base else 0
+        out[species_key(name)] = SpeciesRecord(name, (t1, t2), total)
+    return out
 
-        learnset = rebuild_learnset_for(name) or {}
-
-        species_db[species_key(name)] = {
-            "name": name,
-            "types": [t1, t2],
-            "total": total,
-            "learnset": learnset,
-        }
-
+def _scope_moves(maxdex: int) -> Dict[str, Mapping]:
+    # shared by every session, nested dicts included, so nothing in a record is writable
+    meta = MappingProxyType({"species_scope": str(maxdex)})
     return {
-        "moves_db": moves_db,
-        "species_db": species_db,
-        "roster": STATE.get("roster", []),
-        "locks": STATE.get("locks", []),
-        "caught_counts": STATE.get("caught_counts", {}),
-        "fulfilled": STATE.get("fulfilled", []),
-        "stone_bag": STATE.get("stone_bag", {}),
-        "settings": STATE.get("settings", {}),
-        "opponents": STATE.get("opponents", {"meta":{"sheet_url":"","last_loaded":""},"encounters":[], "cleared":[]}),
-        "last_battle_pick": STATE.get("last_battle_pick", [0,0]),
+        norm_key(rec["name"]): MappingProxyType({
+            "name": rec["name"],
+            "type": normalize_type(rec.get("type", "")),
+            "meta": meta,
+        })
+        for rec in move_registry().records
     }
 
+class GameData:
+    """Read-only species/moves tables for one dex scope, shared by all sessions."""
+    __slots__ = ("maxdex", "species", "moves")
+
+    def __init__(self, maxdex: int, species: Mapping, moves: Mapping):
+        self.maxdex = maxdex
+        self.species = species
+        self.moves = moves
+
+@st.cache_resource(show_spinner=False, max_entries=4)
+def _shared_game_data_for(maxdex: int, fingerprints: Tuple[str, ...]) -> GameData:
+    return GameData(maxdex, MappingProxyType(_scope_species(maxdex)), MappingProxyType(_scope_moves(maxdex)))
+
+def shared_game_data(maxdex: Optional[int] = None) -> GameData:
+    maxdex = int(dex_max() if maxdex is None else maxdex)
+    fps = _game_data_fingerprints()
+    return _run_memo(("game_data", maxdex, fps), lambda: _shared_game_data_for(maxdex, fps))
+
+def species_db() -> ChainMap:
+    """Species for the current scope: session additions over the shared table.
+
+    Writes land in the session layer. Shared records are read-only; copy one
+    with dict(...) before changing it and store the copy back.
+    """
+    return ChainMap(STATE.setdefault("species_db", {}), shared_game_data().species)
+
+def moves_db() -> ChainMap:
+    """Moves known to this session: session additions over the shared table."""
+    return ChainMap(STATE.setdefault("moves_db", {}), shared_game_data().moves)
+
 def ensure_species_in_db(name: str, scope_maxdex: Optional[int] = None) -> bool:
     """
-    Ensure a species exists in STATE['species_db'].
+    Ensure a species exists in species_db() (adding it to the session layer).
 
     scope_maxdex:
       - None  → use dex_max() (respects Pokédex scope, 151/386)
@@ -1688,35 +2923,10 @@ def ensure_species_in_db(name: str, scope_maxdex: Optional[int] = None) -> bool:
         scope_maxdex = dex_max()
 
     sk = species_key(name)
-    if sk in STATE["species_db"]:
+    if sk in species_db():
         return True
 
-    dex = get_pokedex_cached()
-    maxdex = int(scope_maxdex)
-
-    def _find_record(target_name: str):
-        rec = dex.get(ps_id(target_name))
-        if rec and rec.get("forme"):
-            rec = None
-        if rec and not (isinstance(rec.get("num"), int) and 1 <= rec.get("num") <= maxdex):
-            rec = None
-        if rec:
-            return rec
-
-        # fallback: scan by normalized name
-        for _, r in dex.items():
-            if not r:
-                continue
-            if ps_id(r.get("name", "")) != ps_id(target_name):
-                continue
-            if r.get("forme"):
-                continue
-            num = r.get("num")
-            if isinstance(num, int) and 1 <= num <= maxdex:
-                return r
-        return None
-
-    sd = _find_record(name)
+    sd = dex_lookup(name, int(scope_maxdex))
     if not sd:
         return False
 
@@ -1724,242 +2934,650 @@ def ensure_species_in_db(name: str, scope_maxdex: Optional[int] = None) -> bool:
     t1, t2 = purge_fairy_types_pair(sd.get("types", []))
     base = sd.get("baseStats", {})
     total = int(sum(base.values())) if base else 0
-    learnset = rebuild_learnset_for(nm) or {}
+    learnset = shared_learnset(nm)  # shared and read-only; species_db is never saved
+
+    species_db()[species_key(nm)] = {
+        "name": nm,
+        "types": [t1, t2],
+        "total": total,
+        "learnset": learnset,
+    }
+    save_state(STATE)
+    return True
+
+def base_key_for(name: str) -> str:
+    dex = get_pokedex_cached()
+    cur = dex.get(ps_id(name))
+    if not cur:
+        return species_key(name)
+    maxdex = dex_max()
+    while True:
+        pre = cur.get("prevo")
+        if not pre:
+            break
+        pre_rec = dex.get(ps_id(pre))
+        if not pre_rec or pre_rec.get("forme"):
+            break
+        num = pre_rec.get("num")
+        if isinstance(num, int) and 1 <= num <= maxdex:
+            cur = pre_rec
+        else:
+            break
+    return species_key(cur.get("name", name))
+
+# =============================================================================
+# Precompiled species bundle
+# =============================================================================
+# A single JSON document with integer IDs for every non-forme species 1–386
+# holding the final FR/LG level-up map, Showdown 3L/3M/3T damaging sets,
+# evolution edges, totals, typings and the base-species lists for both dex
+# scopes. Build it with:  python "FRLG_Companion_App - Online.py" compile-bundle
+# A deploy without one (or with one compiled from other data) builds its own
+# once after bootstrap, next to the HTTP cache, and every later process on
+# that volume loads it.
+SPECIES_BUNDLE_VERSION = 3
+SPECIES_BUNDLE_PATH = os.getenv("FRLG_SPECIES_BUNDLE") or os.path.join(DATA_DIR, "species_bundle.json")
+SPECIES_BUNDLE_BUILT_PATH = os.path.join(CACHE_DIR, "species_bundle.json")
+SPECIES_BUNDLE_AUTOBUILD = os.getenv("FRLG_SPECIES_BUNDLE_BUILD", "1") != "0"
+BUNDLE_SOURCES = ("pokedex", "learnsets", "moves", "gen3")
+BUNDLE_SCOPES = (151, 386)
+
+def compile_species_bundle(path: str = SPECIES_BUNDLE_PATH) -> Dict:
+    """Build the compact bundle from the currently loaded datasets and write it to `path`."""
+    dex = get_pokedex_cached()
+    lsets = get_showdown_learnsets_cached()
+
+    move_ids: Dict[str, int] = {}
+    moves: List[Tuple[str, Optional[str]]] = []
+
+    def _mid(name: str) -> int:
+        i = move_ids.get(name)
+        if i is None:
+            info = lookup_move(name) or {}
+            i = move_ids[name] = len(moves)
+            moves.append((name, normalize_type(info.get("type", ""))))
+        return i
+
+    recs = sorted(
+        (r for r in dex.values()
+         if r and not r.get("forme") and isinstance(r.get("num"), int) and 1 <= r["num"] <= 386),
+        key=lambda r: (r["num"], r.get("name", "")),
+    )
+    sid_of = {species_key(r["name"]): i for i, r in enumerate(recs)}
+    levelmaps = rebuild_learnsets_for(r["name"] for r in recs)
+
+    species, levelup, sd_level, tm, tutor = [], [], [], [], []
+    for r in recs:
+        name = r["name"]
+        t1, t2 = purge_fairy_types_pair(r.get("types", []))
+        base = r.get("baseStats", {})
+        total = int(sum(base.values())) if base else 0
+        prevo = sid_of.get(species_key(r.get("prevo") or ""), -1)
+        evos = [sid_of[species_key(e)] for e in (r.get("evos") or []) if species_key(e) in sid_of]
+        species.append((species_key(name), name, r["num"], t1, t2, total, prevo, evos))
+
+        lm = levelmaps.get(species_key(name)) or {}
+        levelup.append(tuple((int(lv), tuple(_mid(m) for m in mvs)) for lv, mvs in lm.items()))
+
+        lv_set, tm_set, tu_set = set(), set(), set()
+        learn = (lsets.get(ps_id(name)) or {}).get("learnset") or {}
+        for mv_key, methods in learn.items():
+            meths = methods if isinstance(methods, list) else [methods]
+            tags = [t for t in meths if isinstance(t, str)]
+            in_lv = any(t.startswith("3L") for t in tags)
+            in_tm, in_tu = "3M" in tags, "3T" in tags
+            if not (in_lv or in_tm or in_tu):
+                continue
+            nm = (lookup_move(mv_key) or {}).get("name", clean_move_token(mv_key))
+            if not nm or not move_is_damaging(nm):
+                continue
+            m = _mid(nm)
+            if in_lv: lv_set.add(m)
+            if in_tm: tm_set.add(m)
+            if in_tu: tu_set.add(m)
+        sd_level.append(tuple(sorted(lv_set)))
+        tm.append(tuple(sorted(tm_set)))
+        tutor.append(tuple(sorted(tu_set)))
+
+    scopes = {
+        maxdex: tuple(i for i, r in enumerate(recs) if is_base_for_scope(r, dex, maxdex))
+        for maxdex in BUNDLE_SCOPES
+    }
+    bundle = {
+        "version": SPECIES_BUNDLE_VERSION,
+        "sources": {n: dataset_fingerprint(n) for n in BUNDLE_SOURCES},
+        "moves": tuple(moves),
+        "species": tuple(species),
+        "levelup": tuple(levelup),
+        "sd_level": tuple(sd_level),
+        "tm": tuple(tm),
+        "tutor": tuple(tutor),
+        "scopes": scopes,
+    }
+    if path:
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        _atomic_write_bytes(path, json.dumps(bundle, separators=(",", ":")).encode("utf-8"))
+    return bundle
+
+@st.cache_resource(show_spinner=False, max_entries=4)
+def _load_species_bundle_file(path: str, mtime: float) -> Optional[Dict]:
+    try:
+        with open(path, "rb") as f:
+            bundle = json.loads(decode_bytes(f.read()))
+    except Exception:
+        return None
+    if not isinstance(bundle, dict) or bundle.get("version") != SPECIES_BUNDLE_VERSION:
+        return None
+    bundle["scopes"] = {int(k): v for k, v in bundle["scopes"].items()}  # JSON keys are strings
+    bundle["index"] = {sp[0]: i for i, sp in enumerate(bundle["species"])}
+    return bundle
+
+def species_bundle() -> Optional[Dict]:
+    """
+    The shipped bundle, or None when it is absent or was compiled from other
+    data than what is loaded now. Datasets missing at runtime (e.g. the gen3
+    dump on an offline pod) do not invalidate it.
+    """
+    return _run_memo("species_bundle", _current_species_bundle)
+
+def _current_species_bundle() -> Optional[Dict]:
+    # the shipped bundle, then the one this deploy built for itself
+    for path in (SPECIES_BUNDLE_PATH, SPECIES_BUNDLE_BUILT_PATH):
+        try:
+            mtime = os.path.getmtime(path)
+        except OSError:
+            continue
+        bundle = _load_species_bundle_file(path, mtime)
+        if bundle and _bundle_matches_data(bundle):
+            return bundle
+    return None
+
+def _bundle_matches_data(bundle: Dict) -> bool:
+    for name, want in (bundle.get("sources") or {}).items():
+        try:
+            have = dataset_fingerprint(name)
+        except Exception:
+            have = ""
+        if have and have != want:
+            return False
+    return True
+
+class _BundleBuilder:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.built: Optional[Tuple[str, ...]] = None  # fingerprints of the last bundle written
+        self.busy = False
+
+@st.cache_resource(show_spinner=False)
+def _bundle_builder() -> _BundleBuilder:
+    return _BundleBuilder()
+
+def build_species_bundle_async():
+    """Compile a bundle for the loaded datasets in a daemon thread when none on disk matches them."""
+    if not SPECIES_BUNDLE_AUTOBUILD or species_bundle() is not None:
+        return
+    fps = _game_data_fingerprints()
+    builder = _bundle_builder()
+    with builder.lock:
+        if builder.busy or builder.built == fps:
+            return
+        builder.busy = True
+
+    def _work():
+        try:
+            compile_species_bundle(SPECIES_BUNDLE_BUILT_PATH)
+            with builder.lock:
+                builder.built = fps
+        except Exception:
+            pass  # read-only volume or data changed underneath: the next boot tries again
+        finally:
+            with builder.lock:
+                builder.busy = False
+
+    threading.Thread(target=_work, name="frlg-species-bundle", daemon=True).start()
+
+def _bundle_levelmap(bundle: Dict, sid: int) -> Dict[str, List[str]]:
+    moves = bundle["moves"]
+    return {str(lv): [moves[m][0] for m in mids] for lv, mids in bundle["levelup"][sid]}
 
-    STATE["species_db"][species_key(nm)] = {
-        "name": nm,
-        "types": [t1, t2],
-        "total": total,
-        "learnset": learnset,
-    }
-    save_state(STATE)
-    return True
+# =============================================================================
+# Evolution-family legal moves
+# =============================================================================
+# species -> sorted damaging 3L/3M/3T moves of its whole in-scope evolution
+# family. Built once per scope and data version; every member of a family
+# shares the same tuple object.
+def _member_legal_moves(name: str, bundle: Optional[Dict], lsets: dict) -> set:
+    if bundle is not None:
+        sid = bundle["index"].get(species_key(name))
+        if sid is not None:
+            moves = bundle["moves"]
+            return {moves[m][0] for table in (bundle["sd_level"], bundle["tm"], bundle["tutor"]) for m in table[sid]}
+
+    out = set()
+    k = learnset_key(name)
+    if not k:
+        return out
+    for mv_id, methods in ((lsets.get(k, {}) or {}).get("learnset", {}) or {}).items():
+        meths = methods if isinstance(methods, list) else [methods]
+        if not any(_is_gen3_source(t) for t in meths):
+            continue
+        nm = (lookup_move(mv_id) or {}).get("name", clean_move_token(mv_id))
+        if nm and move_is_damaging(nm):
+            out.add(nm)
+    return out
 
-def base_key_for(name: str) -> str:
-    dex = get_pokedex_cached()
-    cur = dex.get(ps_id(name))
-    if not cur:
-        return species_key(name)
-    maxdex = dex_max()
-    while True:
-        pre = cur.get("prevo")
-        if not pre:
-            break
-        pre_rec = dex.get(ps_id(pre))
-        if not pre_rec or pre_rec.get("forme"):
-            break
-        num = pre_rec.get("num")
-        if isinstance(num, int) and 1 <= num <= maxdex:
-            cur = pre_rec
-        else:
-            break
-    return species_key(cur.get("name", name))
+@st.cache_resource(show_spinner=False, max_entries=4)
+def _family_legal_table_for(maxdex: int, fingerprints: Tuple[str, ...]) -> Dict[str, Tuple[str, ...]]:
+    try:
+        lsets = get_showdown_learnsets_cached() or {}
+    except Exception:
+        return {}
+    bundle = species_bundle()
+    if bundle is not None:
+        return _family_legal_table_from_bundle(bundle, maxdex, lsets)
+    index = dex_index()
+
+    def _rec(name: str):
+        return index.lookup(name, maxdex)
+
+    def _base_of(rec: dict) -> dict:
+        seen = set()
+        while rec.get("prevo") and rec.get("name") not in seen:
+            seen.add(rec.get("name"))
+            prev = _rec(rec["prevo"])
+            if not prev:
+                break
+            rec = prev
+        return rec
+
+    def _family(base: dict) -> List[dict]:
+        fam, seen, q = [], set(), deque([base])
+        while q:
+            cur = q.popleft()
+            key = ps_id(cur.get("name", ""))
+            if key in seen:
+                continue
+            seen.add(key)
+            fam.append(cur)
+            for evn in (cur.get("evos") or []):
+                evr = _rec(evn)
+                if evr and ps_id(evr.get("name", "")) not in seen:
+                    q.append(evr)
+        return fam
+
+    by_base: Dict[str, Tuple[str, ...]] = {}
+    table: Dict[str, Tuple[str, ...]] = {}
+    for sid in index.base_by_name:
+        rec = _rec(sid)
+        if not rec:
+            continue
+        base = _base_of(rec)
+        bkey = ps_id(base.get("name", ""))
+        moves = by_base.get(bkey)
+        if moves is None:
+            names = set()
+            for member in _family(base):
+                names |= _member_legal_moves(member.get("name", ""), bundle, lsets)
+            moves = by_base[bkey] = tuple(sorted(names))
+        table[ps_id(rec.get("name", ""))] = moves
+    return table
+
+def _family_legal_table_from_bundle(bundle: Dict, maxdex: int, lsets: dict) -> Dict[str, Tuple[str, ...]]:
+    # The same walk over the bundle's evolution edges (species ids, -1: none)
+    rows = bundle["species"]
+
+    def _in_scope(sid: int) -> bool:
+        return sid >= 0 and rows[sid][2] <= maxdex
+
+    def _base_of(sid: int) -> int:
+        seen = set()
+        while _in_scope(rows[sid][6]) and sid not in seen:
+            seen.add(sid)
+            sid = rows[sid][6]
+        return sid
+
+    by_base: Dict[int, Tuple[str, ...]] = {}
+    table: Dict[str, Tuple[str, ...]] = {}
+    for sid, row in enumerate(rows):
+        if not _in_scope(sid):
+            continue
+        base = _base_of(sid)
+        moves = by_base.get(base)
+        if moves is None:
+            family, q = set(), deque([base])
+            while q:
+                cur = q.popleft()
+                if cur in family:
+                    continue
+                family.add(cur)
+                q.extend(e for e in rows[cur][7] if _in_scope(e))
+            names = set()
+            for member in family:
+                names |= _member_legal_moves(rows[member][1], bundle, lsets)
+            moves = by_base[base] = tuple(sorted(names))
+        table[ps_id(row[1])] = moves
+    return table
+
+def family_legal_table(maxdex: Optional[int] = None) -> Dict[str, Tuple[str, ...]]:
+    """ps_id(species name) -> legal damaging moves of its evolution family."""
+    maxdex = int(dex_max() if maxdex is None else maxdex)
+    fps = _game_data_fingerprints()
+    return _run_memo(("family_legal", maxdex, fps), lambda: _family_legal_table_for(maxdex, fps))
 
 # =============================================================================
 # Opponents parsing (sheet)
 # =============================================================================
-def parse_sheet_url_to_csv(url: str, preferred_gid: Optional[str]=None) -> Optional[str]:
+def sheet_doc_id(url: str) -> Optional[str]:
+    """Spreadsheet id of a Google Sheets URL, or None for anything else."""
     if not url: return None
     try:
         parts = urlparse(url)
         if "docs.google.com" not in parts.netloc: return None
         bits = parts.path.strip("/").split("/")
         if "spreadsheets" in bits and "d" in bits:
-            i = bits.index("d")
-            doc_id = bits[i+1]
-            qs = parse_qs(parts.query or "")
-            frag_gid = None
-            if parts.fragment:
-                m = re.search(r"(?:^|[&#])gid=(\d+)", parts.fragment)
-                if m: frag_gid = m.group(1)
-            gid = preferred_gid or (qs.get("gid",[None])[0]) or frag_gid or "0"
-            return f"https://docs.google.com/spreadsheets/d/{doc_id}/export?format=csv&gid={gid}"
+            return bits[bits.index("d") + 1]
     except Exception:
         return None
     return None
 
-def load_venusaur_sheet(csv_text: str) -> List[Dict]:
-    rdr = csv.reader(csv_text.splitlines())
-    rows = list(rdr)
+def sheet_csv_url(doc_id: str, gid: str) -> str:
+    return f"https://docs.google.com/spreadsheets/d/{doc_id}/export?format=csv&gid={gid}"
 
-    encounters_list: List[Dict] = []
-    current_enc: Optional[Dict] = None
-    name_counts: Dict[str, int] = {}
-    rownum = 0
 
-    # We use the full Pokédex to detect which cell is a valid species name
-    try:
-        dex = get_pokedex_cached() or {}
-    except Exception:
-        dex = {}
-    maxdex = 386
+# Sheet exports run to thousands of rows, so the parser streams: rows are read
+# one at a time and grouped into trainer blocks (a trainer row plus the rows
+# up to the next one), and each encounter is yielded as soon as its block
+# closes. A block is parsed once per distinct content (see _parse_sheet_block),
+# so re-reading a tab after an edit only parses the trainers that changed.
+_EXP_LABEL_RE = re.compile(r"^\s*(?:extra\s+)?exp(?:erience)?\b")
 
-    def _looks_like_species(cell: str) -> bool:
-        val = clean_invisibles(cell).strip()
-        if not val:
-            return False
-        sid = ps_id(val)
-        if not sid:
-            return False
-        sd = dex.get(sid)
-        if not sd:
-            # small fallback: scan by normalized name
-            for rec in dex.values():
-                if not rec:
-                    continue
-                nm = rec.get("name", "")
-                if ps_id(nm) == sid:
-                    sd = rec
-                    break
-        if not sd:
-            return False
-        if sd.get("forme"):
-            return False
-        num = sd.get("num")
-        return isinstance(num, int) and 1 <= num <= maxdex
+def iter_lines(text: str):
+    """Lazily yield text.splitlines()."""
+    pos = 0
+    for m in _LINE_BREAK_RE.finditer(text):
+        yield text[pos:m.start()]
+        pos = m.end()
+    if pos < len(text):
+        yield text[pos:]
+
+class _SheetCells:
+    """
+    Per-parse memo of the cells a tab repeats all through (species, notes,
+    moves): each distinct cell is classified or resolved once.
+    """
+    __slots__ = ("known_species", "species_cells", "species_recs", "move_cells")
 
-    for r in rows:
-        rownum += 1
+    def __init__(self):
+        # We use the full Pokédex to detect which cell is a valid species name
+        try:
+            self.known_species = species_ids(386)
+        except Exception:
+            self.known_species = frozenset()
+        self.species_cells: Dict[str, bool] = {}
+        self.species_recs: Dict[str, Optional[Dict]] = {}
+        self.move_cells: Dict[str, Optional[Tuple[str, str]]] = {}
+
+    def is_species(self, cell: str) -> bool:
+        hit = self.species_cells.get(cell)
+        if hit is None:
+            hit = self.species_cells[cell] = ps_id(cell) in self.known_species
+        return hit
+
+    def species_rec(self, poke: str) -> Optional[Dict]:
+        # species record, fetch if needed (None: unknown species)
+        if poke not in self.species_recs:
+            sk = species_key(poke)
+            sp = species_db().get(sk)
+            if not sp and ensure_species_in_db(poke, scope_maxdex=386):
+                sp = species_db().get(sk)
+            self.species_recs[poke] = sp or None
+        return self.species_recs[poke]
+
+    def typed_move(self, cell: str) -> Optional[Tuple[str, str]]:
+        # (move, type) for a damaging, allowed move cell; None for anything else
+        if cell in self.move_cells:
+            return self.move_cells[cell]
+        typed = None
+        raw_cell = clean_invisibles(cell).strip()
+        if raw_cell:
+            info = lookup_move(raw_cell)
+            # Canonical name if we know it, otherwise raw text
+            move_name = (info.get("name", raw_cell) if info else raw_cell)
+            if move_is_damaging(move_name) and move_name.lower() not in FRLG_EXCLUDE_MOVES:
+                # Determine move type (from lookup or cached moves db)
+                mtype = normalize_type(
+                    (info.get("type") if info else None)
+                    or moves_db().get(norm_key(move_name), {}).get("type", "")
+                )
+                if mtype:
+                    ensure_move_in_db(move_name, default_type=mtype)
+                    typed = (move_name, mtype)
+        self.move_cells[cell] = typed
+        return typed
 
-        # guarantee at least 10 columns (trainer, …, 4 moves)
-        if len(r) < 10:
-            r = r + [""] * (10 - len(r))
+def iter_sheet_blocks(lines) -> Iterator[Tuple[str, int, List[Tuple[int, List[str]]]]]:
+    """
+    Trainer blocks from the lines of a sheet tab's CSV export, in sheet order:
+    (trainer name, row number of the trainer row, [(row offset, cells), ...]).
 
+    A non-empty first column starts a block; empty rows and rows before the
+    first trainer are dropped.
+    """
+    name: Optional[str] = None
+    start = 0
+    rows: List[Tuple[int, List[str]]] = []
+    for rownum, r in enumerate(csv.reader(lines), start=1):
         # empty row? skip
-        if not any((c or "").strip() for c in r):
+        if not any(c.strip() for c in r):
             continue
-
-        # trainer cell
-        raw_trainer = (r[0] or "")
-        trainer_cell = clean_invisibles(raw_trainer).strip()
-
-        # Normalize to collapse small differences into the same base label
-        norm_base = re.sub(r"\s+", " ", trainer_cell).strip()
-
-        # New encounter starts whenever trainer cell is non-empty
-        if norm_base:
-            base_name = norm_base
-            count = name_counts.get(base_name, 0) + 1
-            name_counts[base_name] = count
-            suffix = f" #{count}" if count > 1 else ""
-            label_unique = f"{base_name}{suffix}"
-            current_enc = {"label": label_unique, "base_label": base_name, "mons": []}
-            encounters_list.append(current_enc)
-
-        # Find Pokémon species and (nearby) level in this row
+        # trainer cell; a new block starts whenever it is non-empty
+        base_name = _WHITESPACE_RE.sub(" ", clean_invisibles(r[0]).strip()).strip()
+        if base_name:
+            if name is not None:
+                yield name, start, rows
+            name, start, rows = base_name, rownum, []
+        # if we have no trainer context, the row can't add anything
+        if name is not None:
+            rows.append((rownum - start, r))
+    if name is not None:
+        yield name, start, rows
+
+def sheet_block_sha(rows: List[Tuple[int, List[str]]]) -> str:
+    """Content hash of a trainer block; it doesn't depend on where the block sits in the tab."""
+    return hashlib.sha1(repr(rows).encode("utf-8")).hexdigest()
+
+@bounded_cache(max_entries=4096)
+def _parse_sheet_block(block_sha: str, fingerprints: Tuple[str, ...], _rows, _cells: _SheetCells) -> Tuple[Dict, ...]:
+    """
+    Pokémon of one trainer block; source_row is relative to the trainer row.
+    Shared between parses, so callers copy before handing them out.
+    """
+    mons: List[Dict] = []
+    for offset, r in _rows:
+        # Rows are read as if padded to 10 columns (trainer, …, 4 moves);
+        # cells past the end of a short row are empty.
+        n = len(r)
+        width = max(n, 10)
+
+        # Find Pokémon species and (nearby) level in this row.
+        # All but last 4 columns are metadata (location, notes, level, species, etc.)
         poke = ""
         lvl_str = ""
-
-        # All but last 4 columns are metadata (location, notes, level, species, etc.)
-        upper_bound = max(1, len(r) - 4)
-        for idx in range(1, upper_bound):
-            cell = r[idx]
-            if _looks_like_species(cell):
-                poke = clean_invisibles(cell).strip()
+        upper_bound = width - 4
+        for idx in range(1, min(upper_bound, n)):
+            if _cells.is_species(r[idx]):
+                poke = clean_invisibles(r[idx]).strip()
                 # try next few columns for a level (digits)
-                for j in range(idx + 1, min(idx + 4, upper_bound)):
-                    lv_cand = clean_invisibles(r[j]).strip()
-                    if re.search(r"\d+", lv_cand or ""):
-                        lvl_str = lv_cand
+                for j in range(idx + 1, min(idx + 4, upper_bound, n)):
+                    if _DIGITS_RE.search(r[j]):  # cleaning never adds or removes digits
+                        lvl_str = clean_invisibles(r[j]).strip()
                         break
                 break
+        if not poke:
+            continue
 
-        # if we still have no trainer context or no Pokémon, skip the row
-        if not current_enc or not poke:
+        sp = _cells.species_rec(poke)
+        if not sp:
+            # unknown species? skip this row
             continue
 
         # level parsing
-        try:
-            m = re.findall(r"\d+", lvl_str or "")
-            level = int(m[0]) if m else 1
-        except Exception:
-            level = 1
-
-        # species record, fetch if needed
-        sk = species_key(poke)
-        sp = STATE["species_db"].get(sk)
-        if not sp:
-            if ensure_species_in_db(poke, scope_maxdex=386):
-                sp = STATE["species_db"].get(sk)
-            if not sp:
-                # unknown species? skip this row
-                continue
+        m = _DIGITS_RE.search(lvl_str)
+        level = int(m.group()) if m else 1
 
-        # Column G (index 6) holds the *exact* move this Pokémon uses in the sheet.
-        # We take only that cell, keep it if it is a damaging move, and type it.
         # Columns G–J (indices 6–9) hold up to 4 moves for this Pokémon.
         # We take those cells, keep only damaging + allowed moves, and type them.
         typed_moves: List[Tuple[str, str]] = []
         seen_moves: set[str] = set()
-
-        # Limit to 4 move columns: G, H, I, J → indices 6–9
-        for col in range(6, min(len(r), 10)):
-            raw_cell = clean_invisibles(r[col]).strip()
-            if not raw_cell:
-                continue
-
-            info = lookup_move(raw_cell)
-            # Canonical name if we know it, otherwise raw text
-            move_name = (info.get("name", raw_cell) if info else raw_cell)
-            key = move_name.lower()
-
-            # Avoid duplicates and excluded moves
-            if key in seen_moves:
-                continue
-            if not move_is_damaging(move_name) or key in FRLG_EXCLUDE_MOVES:
+        for col in range(6, min(n, 10)):
+            typed = _cells.typed_move(r[col])
+            # Avoid duplicates
+            if typed is None or typed[0].lower() in seen_moves:
                 continue
+            typed_moves.append(typed)
+            seen_moves.add(typed[0].lower())
 
-            # Determine move type (from lookup or cached moves db)
-            mtype = normalize_type(
-                (info.get("type") if info else None)
-                or STATE["moves_db"].get(norm_key(move_name), {}).get("type", "")
-            )
-            if not mtype:
-                continue
-
-            ensure_move_in_db(move_name, default_type=mtype)
-            typed_moves.append((move_name, mtype))
-            seen_moves.add(key)
-        mon = {
+        mons.append({
             "species": sp["name"],
             "level": int(level),
             "types": purge_fairy_types_pair(sp["types"]),
             "moves": typed_moves,
-            "source_row": rownum,
+            "source_row": offset,
             "total": sp["total"],
-        }
-        current_enc["mons"].append(mon)
-
-    # filter empty encounters (and accidental “exp” / “extra exp” labels)
-    return [
-        enc
-        for enc in encounters_list
-        if enc.get("mons")
-        and not re.match(
-            r"^\s*(?:extra\s+)?exp(?:erience)?\b",
-            (enc.get("base_label", "") or "").lower(),
-        )
-    ]
+        })
+    return tuple(mons)
 
-@st.cache_data(show_spinner=False)
-def _parse_csv_to_encounters(csv_text: str) -> List[Dict]:
-    # Cache the CSV-to-encounters parse. Same output as load_venusaur_sheet.
-    return load_venusaur_sheet(csv_text)
+def iter_sheet_encounters(lines) -> Iterator[Dict]:
+    """
+    Encounters from the lines of a sheet tab's CSV export, in sheet order.
 
-@st.cache_data(show_spinner=False)
-def _build_encounters_for(starter: str, sheet_url: str) -> List[Dict]:
-    main_gid = STARTER_GID.get(starter, STARTER_GID["Bulbasaur"])
-    main_csv = parse_sheet_url_to_csv(sheet_url, preferred_gid=main_gid)
-    enc_main = _parse_csv_to_encounters(fetch_text(main_csv)) if main_csv else []
+    Repeated trainer names are numbered ("Youngster #2") across the whole tab,
+    including encounters that are dropped afterwards (no usable Pokémon, or
+    "exp" filler labels).
+    """
+    fps = _game_data_fingerprints()
+    cells = _SheetCells()
+    name_counts: Dict[str, int] = {}
 
-    all_rivals = []
+    for base_name, start, rows in iter_sheet_blocks(lines):
+        count = name_counts.get(base_name, 0) + 1
+        name_counts[base_name] = count
+        mons = _parse_sheet_block(sheet_block_sha(rows), fps, rows, cells)
+        # filter empty encounters (and accidental “exp” / “extra exp” labels)
+        if not mons or _EXP_LABEL_RE.match(base_name.lower()):
+            continue
+        suffix = f" #{count}" if count > 1 else ""
+        yield {
+            "label": f"{base_name}{suffix}",
+            "base_label": base_name,
+            "mons": [
+                dict(m, types=list(m["types"]), moves=list(m["moves"]), source_row=start + m["source_row"])
+                for m in mons
+            ],
+        }
+
+def load_venusaur_sheet(csv_text: str) -> List[Dict]:
+    return list(iter_sheet_encounters(iter_lines(csv_text)))
+
+# Sheet tabs are fetched per spreadsheet (doc id): each distinct starter gid
+# once, in parallel, and kept in memory so every starter's list is built from
+# the same downloads. Parses are shared per (doc id, gid, content hash).
+SHEET_TABS_MAX_AGE = 10 * 60  # seconds before tabs are fetched again (same as the HTTP cache TTL)
+
+class SheetTab:
+    """One downloaded sheet tab (CSV export)."""
+    __slots__ = ("doc_id", "gid", "text", "sha")
+
+    def __init__(self, doc_id: str, gid: str, text: str):
+        self.doc_id = doc_id
+        self.gid = gid
+        self.text = text
+        self.sha = _text_sha(text)
+
+class _SheetTabStore:
+    """Downloaded tabs shared by every session: doc_id -> (fetched at, {gid: SheetTab})."""
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.docs: Dict[str, Tuple[float, Dict[str, SheetTab]]] = {}
+
+@st.cache_resource(show_spinner=False)
+def _sheet_tab_store_for_process() -> _SheetTabStore:
+    return _SheetTabStore()
+
+def _sheet_tab_store() -> _SheetTabStore:
+    return _run_memo("sheet_tab_store", _sheet_tab_store_for_process)
+
+def sheet_tab_gids() -> List[str]:
+    """Distinct gids of the starter tabs, in STARTER_OPTIONS order."""
+    gids: List[str] = []
     for s in STARTER_OPTIONS:
         g = STARTER_GID.get(s)
-        csv_u = parse_sheet_url_to_csv(sheet_url, preferred_gid=g)
-        if not csv_u:
-            continue
-        encs = _parse_csv_to_encounters(fetch_text(csv_u))
-        all_rivals.extend([e for e in encs if is_rival_encounter(e)])
+        if g and g not in gids:
+            gids.append(g)
+    return gids
+
+def fetch_sheet_tabs(sheet_url: str, max_age: Optional[float] = SHEET_TABS_MAX_AGE,
+                     revalidate: bool = False) -> Dict[str, SheetTab]:
+    """
+    Every starter tab of the sheet: {gid: SheetTab}. Tabs downloaded less than
+    `max_age` seconds ago are reused (max_age=None: any copy in memory).
+    revalidate=True always asks upstream, past the HTTP cache too.
+    """
+    doc_id = sheet_doc_id(sheet_url)
+    if not doc_id:
+        return {}
+    store = _sheet_tab_store()
+    with store.lock:
+        held = store.docs.get(doc_id)
+    if held and not revalidate and (max_age is None or time.monotonic() - held[0] < max_age):
+        return held[1]
+    return single_flight().run(("sheet", doc_id, revalidate), lambda: _fetch_sheet_tabs_now(doc_id, revalidate),
+                               timeout=BOOTSTRAP_TIMEOUTS["opponents"])
+
+def _fetch_sheet_tabs_now(doc_id: str, revalidate: bool = False) -> Dict[str, SheetTab]:
+    gids = sheet_tab_gids()
+    if not gids:
+        return {}
+    urls = [sheet_csv_url(doc_id, g) for g in gids]
+    with ThreadPoolExecutor(max_workers=len(urls), thread_name_prefix="frlg-sheet") as pool:
+        texts = list(pool.map(lambda u: fetch_text(u, revalidate=revalidate), urls))
+    tabs = {g: SheetTab(doc_id, g, t) for g, t in zip(gids, texts)}
+    store = _sheet_tab_store()
+    with store.lock:
+        store.docs[doc_id] = (time.monotonic(), tabs)
+    return tabs
+
+@bounded_cache(max_entries=16)
+def _parse_sheet_tab(doc_id: str, gid: str, sha: str, fingerprints: Tuple[str, ...],
+                     _text: str) -> List[Dict]:
+    # Shared result: only _build_encounters_cached reads it, and that copies its own output.
+    # fingerprints (of the game datasets the parse resolves against) only key the cache.
+    return load_venusaur_sheet(_text)
+
+def _parsed_tab(tab: SheetTab, fingerprints: Tuple[str, ...]) -> List[Dict]:
+    return _parse_sheet_tab(tab.doc_id, tab.gid, tab.sha, fingerprints, tab.text)
+
+def _build_encounters_for(starter: str, sheet_url: str, tabs: Optional[Dict[str, SheetTab]] = None) -> List[Dict]:
+    if tabs is None:
+        tabs = fetch_sheet_tabs(sheet_url)
+    shas = tuple(sorted((g, t.sha) for g, t in tabs.items()))
+    return _build_encounters_cached(starter, sheet_url, _game_data_fingerprints(), shas, tabs)
+
+@bounded_cache(max_entries=16, copy_result=True)
+def _build_encounters_cached(starter: str, sheet_url: str, fingerprints: Tuple[str, ...],
+                             shas: Tuple[Tuple[str, str], ...], _tabs: Dict[str, SheetTab]) -> List[Dict]:
+    # shas ((gid, sha) of every tab) key the cache; _tabs holds the texts they hash
+    known = _encounter_registry().get((sheet_url, starter))
+    if known and known["tabs"] == dict(shas):
+        return copy.deepcopy(known["encounters"])
+
+    main_tab = _tabs.get(STARTER_GID.get(starter, STARTER_GID["Bulbasaur"]))
+    enc_main = _parsed_tab(main_tab, fingerprints) if main_tab else []
+
+    all_rivals = []
+    for g in sheet_tab_gids():
+        if g in _tabs:
+            all_rivals.extend([e for e in _parsed_tab(_tabs[g], fingerprints) if is_rival_encounter(e)])
 
     rivals_filtered = _filter_rival_encounters(all_rivals, starter)
 
@@ -1977,33 +3595,416 @@ def _build_encounters_for(starter: str, sheet_url: str) -> List[Dict]:
     # Preserve starter-tab order first, then any extra rivals we added
     main_labels = [e["label"] for e in enc_main]
     tail = [e for e in merged if e["label"] not in main_labels]
+    _encounter_registry()[(sheet_url, starter)] = {"tabs": dict(shas), "encounters": copy.deepcopy(enc_main + tail)}
     return enc_main + tail
 
+# =============================================================================
+# Offline encounter packs
+# =============================================================================
+# A single pickle with every starter's finished opponent list, frozen from the
+# sheet: species and (move, type) pairs are stored once in tables and
+# encounters refer to them by index. When a pack for the opponents sheet is
+# shipped, sessions load from it and never download or parse the CSV tabs.
+# Build it with:  python "FRLG_Companion_App - Online.py" compile-encounters
+# (or from exported tabs: ... compile-encounters --csv Bulbasaur=venusaur.csv)
+ENCOUNTER_PACK_VERSION = 1
+ENCOUNTER_PACK_PATH = os.getenv("FRLG_ENCOUNTER_PACK") or os.path.join(DATA_DIR, "encounter_pack.pkl")
+
+def compile_encounter_pack(sheet_url: str, tabs: Dict[str, SheetTab],
+                           path: str = ENCOUNTER_PACK_PATH) -> Dict:
+    """Freeze the encounters of every starter whose tab is in `tabs` and write the pack to `path`."""
+    species_ids: Dict[Tuple, int] = {}
+    move_ids: Dict[Tuple[str, str], int] = {}
+
+    def _intern(ids: Dict, row: Tuple) -> int:
+        i = ids.get(row)
+        if i is None:
+            i = ids[row] = len(ids)
+        return i
+
+    starters = {}
+    for starter in STARTER_OPTIONS:
+        if STARTER_GID.get(starter) not in tabs:
+            continue
+        starters[starter] = tuple(
+            (enc["label"], enc["base_label"], tuple(
+                (_intern(species_ids, (m["species"], m["types"][0], m["types"][1], m["total"])),
+                 int(m["level"]),
+                 tuple(_intern(move_ids, tuple(mv)) for mv in m["moves"]),
+                 m.get("source_row"))
+                for m in enc["mons"]))
+            for enc in _build_encounters_for(starter, sheet_url, tabs)
+        )
+    pack = {
+        "version": ENCOUNTER_PACK_VERSION,
+        "sheet": sheet_doc_id(sheet_url),
+        "tabs": {g: t.sha for g, t in tabs.items()},
+        "sources": {n: dataset_fingerprint(n) for n in BUNDLE_SOURCES},
+        "compiled_at": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "species": tuple(species_ids),
+        "moves": tuple(move_ids),
+        "starters": starters,
+    }
+    if path:
+        _atomic_write_bytes(path, pickle.dumps(pack, protocol=pickle.HIGHEST_PROTOCOL))
+    return pack
+
+@st.cache_resource(show_spinner=False)
+def _load_encounter_pack_file(path: str, mtime: float) -> Optional[Dict]:
+    try:
+        with open(path, "rb") as f:
+            pack = pickle.load(f)
+    except Exception:
+        return None
+    if not isinstance(pack, dict) or pack.get("version") != ENCOUNTER_PACK_VERSION:
+        return None
+    return pack
+
+def encounter_pack() -> Optional[Dict]:
+    """
+    The shipped pack, or None when there is none. Unlike the species bundle it
+    is not dropped when the datasets change: it is a frozen gauntlet, not a cache.
+    """
+    return _run_memo("encounter_pack", _current_encounter_pack)
+
+def _current_encounter_pack() -> Optional[Dict]:
+    try:
+        mtime = os.path.getmtime(ENCOUNTER_PACK_PATH)
+    except OSError:
+        return None
+    return _load_encounter_pack_file(ENCOUNTER_PACK_PATH, mtime)
+
+def pack_has(starter: str, sheet_url: str) -> bool:
+    pack = encounter_pack()
+    return bool(pack and pack["sheet"] == sheet_doc_id(sheet_url) and starter in pack["starters"])
+
+def pack_encounters(starter: str, sheet_url: str) -> Optional[List[Dict]]:
+    """A fresh copy of the pack's encounters for `starter`, or None if the pack doesn't cover it."""
+    if not pack_has(starter, sheet_url):
+        return None
+    pack = encounter_pack()
+    species, moves = pack["species"], pack["moves"]
+    out = []
+    for label, base_label, mons in pack["starters"][starter]:
+        out.append({"label": label, "base_label": base_label, "mons": [
+            {
+                "species": species[sid][0],
+                "level": level,
+                "types": [species[sid][1], species[sid][2]],
+                "moves": [moves[m] for m in mids],
+                "source_row": row,
+                "total": species[sid][3],
+            }
+            for sid, level, mids, row in mons
+        ]})
+    return out
+
+def encounters_for(starter: str, sheet_url: str, tabs: Optional[Dict[str, SheetTab]] = None) -> Tuple[List[Dict], str]:
+    """(encounters, "pack" | "sheet"): the shipped pack when it covers this sheet and starter, else the sheet."""
+    packed = pack_encounters(starter, sheet_url)
+    if packed is not None:
+        return packed, "pack"
+    return _build_encounters_for(starter, sheet_url, tabs), "sheet"
+
+
+# =============================================================================
+# Opponent table and run progress
+# =============================================================================
+# A load of opponents becomes an EncounterTable shared by every session that
+# loaded the same content. A session keeps only the table's id, a bitmap of
+# the mons it has beaten (bit k: table.mons[k]) and the cleared log, so
+# beating and undoing flip bits. The log is the run's record: when the table
+# changes (a sheet refresh, a starter switch, a save made against another
+# version of the sheet) it is replayed onto the new table, so beaten trainers
+# and Pokémon stay beaten.
+# The store keeps the ENCOUNTER_TABLES_MAX most recently used tables for
+# sessions that come back to them; a table a live session holds stays
+# reachable however old it is.
+ENCOUNTER_TABLES_MAX = 32
+
+def encounter_hash(enc: Dict, rows: bool = True) -> str:
+    """Content hash of an encounter: label plus each Pokémon's species, level, moves and source row."""
+    key = (enc.get("label"), [
+        (m.get("species"), m.get("level"), [tuple(mv) for mv in m.get("moves", [])],
+         m.get("source_row") if rows else None)
+        for m in enc.get("mons", [])
+    ])
+    return hashlib.sha1(repr(key).encode("utf-8")).hexdigest()
+
+class OpponentMon:
+    """One opponent Pokémon of an EncounterTable; shared between sessions, so never modified."""
+    __slots__ = ("species", "level", "types", "moves", "source_row", "total")
+
+    def __init__(self, species: str, level: int, types: Tuple[Optional[str], Optional[str]],
+                 moves: Tuple[Tuple[str, str], ...], source_row: Optional[int], total: int):
+        self.species = species
+        self.level = level
+        self.types = types
+        self.moves = moves
+        self.source_row = source_row
+        self.total = total
+
+class EncounterTable:
+    """
+    Every encounter of one opponents load, in order. Mons are stored flat:
+    encounter i owns mons[starts[i]:starts[i + 1]].
+    """
+    __slots__ = ("table_id", "labels", "base_labels", "starts", "mons", "contents", "index", "__weakref__")
+
+    def __init__(self, table_id: str, encounters: List[Dict]):
+        starts, mons = [0], []
+        for enc in encounters:
+            for m in enc["mons"]:
+                mons.append(OpponentMon(
+                    m["species"], int(m["level"]), tuple(purge_fairy_types_pair(m.get("types") or [])),
+                    tuple(tuple(mv) for mv in m.get("moves", [])), m.get("source_row"), int(m.get("total", 0)),
+                ))
+            starts.append(len(mons))
+        self.table_id = table_id
+        self.labels = tuple(enc["label"] for enc in encounters)
+        self.base_labels = tuple(enc.get("base_label", enc["label"]) for enc in encounters)
+        self.starts = tuple(starts)
+        self.mons = tuple(mons)
+        # encounter hashes without source rows: edits elsewhere in a tab shift rows, not content
+        self.contents = tuple(encounter_hash(enc, rows=False) for enc in encounters)
+        self.index: Dict[str, int] = {}
+        for i, label in enumerate(self.labels):
+            self.index.setdefault(label, i)
+
+    def __len__(self) -> int:
+        return len(self.labels)
+
+    def slots(self, i: int) -> range:
+        return range(self.starts[i], self.starts[i + 1])
+
+class _EncounterTableStore:
+    """Encounter tables shared by every session, by table_id."""
+    def __init__(self):
+        self.lock = threading.Lock()
+        # the most recently used tables, least recently used first
+        self.tables: "OrderedDict[str, EncounterTable]" = OrderedDict()
+        # every table still referenced anywhere, sessions included
+        self.live: "weakref.WeakValueDictionary[str, EncounterTable]" = weakref.WeakValueDictionary()
+
+    def keep(self, table: "EncounterTable") -> "EncounterTable":
+        # under self.lock
+        table = self.live.setdefault(table.table_id, table)
+        self.tables[table.table_id] = table
+        self.tables.move_to_end(table.table_id)
+        while len(self.tables) > ENCOUNTER_TABLES_MAX:
+            self.tables.popitem(last=False)
+        return table
+
+@st.cache_resource(show_spinner=False)
+def _encounter_table_store_for_process() -> _EncounterTableStore:
+    return _EncounterTableStore()
+
+def _encounter_table_store() -> _EncounterTableStore:
+    return _run_memo("encounter_table_store", _encounter_table_store_for_process)
+
+def _stored_table(table_id: Optional[str]) -> Optional[EncounterTable]:
+    store = _encounter_table_store()
+    with store.lock:
+        table = store.live.get(table_id or "")
+        if table is not None:
+            store.keep(table)
+    return table
+
+def intern_encounter_table(encounters: List[Dict]) -> EncounterTable:
+    """The shared table for an encounter list; sessions that load the same content get the same object."""
+    hashes = tuple(encounter_hash(enc) for enc in encounters)
+    table_id = hashlib.sha1("".join(hashes).encode("ascii")).hexdigest()
+    table = _stored_table(table_id)
+    if table is None:
+        table = EncounterTable(table_id, encounters)
+        store = _encounter_table_store()
+        with store.lock:
+            table = store.keep(table)
+    return table
+
+def opponent_table() -> Optional[EncounterTable]:
+    """
+    This session's opponents, or None before any are loaded (or when the
+    session names a table this process doesn't have, e.g. from an imported save).
+    """
+    table_id = STATE["opponents"]["meta"].get("table")
+    held = st.session_state.get("_opponent_table")
+    if held is not None and held.table_id == table_id:
+        return held
+    table = _stored_table(table_id)
+    # the session's reference is what keeps its table in the store
+    st.session_state["_opponent_table"] = table
+    return table
+
+def opponents_sheet_url() -> str:
+    return STATE.get("opponents", {}).get("meta", {}).get("sheet_url") or DEFAULT_SHEET_URL
+
+def slot_mask(slots) -> int:
+    mask = 0
+    for k in slots:
+        mask |= 1 << k
+    return mask
+
+def remaining_encounters(table: EncounterTable, beaten: int) -> List[Tuple[int, List[int]]]:
+    """(encounter index, slots of its mons not beaten yet) for every encounter with any left, in order."""
+    out = []
+    for i in range(len(table)):
+        left = [k for k in table.slots(i) if not beaten >> k & 1]
+        if left:
+            out.append((i, left))
+    return out
+
+def remaining_parties() -> List[Tuple[str, str, List[OpponentMon]]]:
+    """(label, base label, mons left) of this session's remaining encounters."""
+    table = opponent_table()
+    if table is None:
+        return []
+    return [(table.labels[i], table.base_labels[i], [table.mons[k] for k in left])
+            for i, left in remaining_encounters(table, STATE["opponents"].get("beaten", 0))]
+
+def beat_opponents(table: EncounterTable, i: int, slots: List[int], what: str) -> Dict:
+    """Mark `slots` of encounter i beaten and log it ("pokemon": one mon; "trainer": the rest of the party)."""
+    opp = STATE["opponents"]
+    item = {"id": new_guid(), "what": what, "trainer": table.labels[i], "slots": list(slots)}
+    if what == "pokemon":
+        mon = table.mons[slots[0]]
+        item.update(species=mon.species, level=mon.level, row=mon.source_row)
+    else:
+        # which mons "the rest of the party" was, so a replay after an undo doesn't widen it
+        item["mons"] = [[m.species, m.level, m.source_row] for m in (table.mons[k] for k in slots)]
+        item["count"] = len(slots)
+    opp["cleared"].append(item)
+    opp["beaten"] = opp.get("beaten", 0) | slot_mask(slots)
+    return item
+
+def can_undo_cleared(item: Dict, beaten: int) -> bool:
+    mask = slot_mask(item.get("slots") or [])
+    return bool(mask) and not item.get("undone") and beaten & mask == mask
+
+def undo_cleared(item: Dict):
+    opp = STATE["opponents"]
+    opp["beaten"] = opp.get("beaten", 0) & ~slot_mask(item.get("slots") or [])
+    item["undone"] = True
+
+def _match_cleared_mon(table: EncounterTable, free: List[int], want: Tuple) -> Optional[int]:
+    # species + level + row, then species + level, then species (edits above a trainer shift its rows)
+    for n in (3, 2, 1):
+        for k in free:
+            m = table.mons[k]
+            if (m.species, m.level, m.source_row)[:n] == want[:n]:
+                return k
+    return None
+
+def replay_cleared_log(table: EncounterTable, log: List[Dict]) -> int:
+    """
+    The beaten bitmap for `table` from the cleared log, in order; undone
+    entries are skipped. Each entry's slots are re-pointed at `table` (only
+    the mons it beat that are still on the sheet).
+    """
+    beaten = 0
+    for item in log:
+        if item.get("undone"):
+            continue
+        i = table.index.get(item.get("trainer"))
+        free = [k for k in table.slots(i) if not beaten >> k & 1] if i is not None else []
+        if item.get("what") == "pokemon":
+            k = _match_cleared_mon(table, free, (item.get("species"), item.get("level"), item.get("row")))
+            slots = [] if k is None else [k]
+            if k is not None:
+                item.update(level=table.mons[k].level, row=table.mons[k].source_row)
+        elif item.get("mons") is None:
+            slots = free  # logged before trainer entries named their mons: the rest of the party
+        else:
+            slots = []
+            for ref in item["mons"]:
+                k = _match_cleared_mon(table, free, tuple(ref))
+                if k is not None:
+                    free.remove(k)
+                    slots.append(k)
+                    ref[1:] = [table.mons[k].level, table.mons[k].source_row]
+        item["slots"] = slots
+        beaten |= slot_mask(slots)
+    return beaten
+
+def table_changes(old: Optional[EncounterTable], new: EncounterTable) -> Dict[str, int]:
+    """How many trainers are unchanged, changed, added and removed going from `old` to `new`."""
+    counts = {"unchanged": 0, "changed": 0, "added": 0, "removed": 0}
+    for i, label in enumerate(new.labels):
+        j = old.index.get(label) if old is not None else None
+        if j is None:
+            counts["added"] += 1
+        else:
+            counts["unchanged" if old.contents[j] == new.contents[i] else "changed"] += 1
+    if old is not None:
+        counts["removed"] = sum(1 for label in old.labels if label not in new.index)
+    return counts
+
+def _install_encounters(encounters: List[Dict], sheet_url: str, starter: str, source: str) -> Dict[str, int]:
+    # Point the session at the table for `encounters`; the battle pick follows its trainer when it survives
+    opp = STATE["opponents"]
+    meta = opp["meta"]
+    old = opponent_table()
+    enc_idx, mon_idx = STATE.get("last_battle_pick", [0, 0])
+    before = remaining_encounters(old, opp.get("beaten", 0)) if old is not None else []
+    picked = old.labels[before[enc_idx][0]] if 0 <= enc_idx < len(before) else None
+
+    table = intern_encounter_table(encounters)
+    counts = table_changes(old, table)
+    if old is not table:
+        opp["beaten"] = replay_cleared_log(table, opp["cleared"])
+    meta["table"] = table.table_id
+    st.session_state["_opponent_table"] = table
+
+    labels = [table.labels[i] for i, _ in remaining_encounters(table, opp["beaten"])]
+    if picked in labels:
+        STATE["last_battle_pick"] = [labels.index(picked), mon_idx]
+    else:
+        STATE["last_battle_pick"] = [max(0, min(enc_idx, len(labels) - 1)), 0]
+    meta["sheet_url"] = sheet_url
+    meta["last_loaded"] = f"starter={starter}"
+    meta["source"] = source
+    save_state(STATE)
+    return counts
+
+def refresh_opponents() -> Dict[str, int]:
+    """
+    Reload the opponents from where they came from and reconcile them into
+    the run: a table from the encounter pack re-reads the pack, anything else
+    re-downloads the sheet (only the trainer blocks that changed are parsed
+    again). Raises if the sheet can't be read.
+    """
+    url = opponents_sheet_url()
+    starter = (STATE.get("settings", {}) or {}).get("starter", "Bulbasaur")
+    if STATE["opponents"]["meta"].get("source") == "pack":
+        packed = pack_encounters(starter, url)
+        if packed is not None:
+            return _install_encounters(packed, url, starter, "pack")
+    tabs = fetch_sheet_tabs(url, revalidate=True)
+    if not tabs:
+        raise ValueError(f"Not a Google Sheets URL: {url}")
+    return _install_encounters(_build_encounters_for(starter, url, tabs), url, starter, "sheet")
 
 def _reload_opponents_for_current_settings():
     try:
-        url = (STATE.get("opponents", {}).get("meta", {}).get("sheet_url") or DEFAULT_SHEET_URL)
+        url = opponents_sheet_url()
         starter = (STATE.get("settings", {}) or {}).get("starter", "Bulbasaur")
-        encounters = _build_encounters_for(starter, url)
-        STATE["opponents"]["encounters"] = encounters
-        STATE["opponents"]["meta"]["sheet_url"] = url
-        STATE["opponents"]["meta"]["last_loaded"] = f"starter={starter}"
-        STATE["last_battle_pick"] = [0, 0]  # reset stale indices
-        save_state(STATE)
+        # Switching starter re-merges tabs already in memory (or reads the pack): no download
+        tabs = None if pack_has(starter, url) else fetch_sheet_tabs(url, max_age=None)
+        encounters, source = encounters_for(starter, url, tabs)
+        _install_encounters(encounters, url, starter, source)
     except Exception:
         pass
 
-def autoload_opponents_if_empty():
+def autoload_opponents_if_empty(tabs: Optional[Dict[str, SheetTab]] = None):
+    # The session's own sheet (the default one until it picks another); `tabs` are that sheet's, if already fetched
     try:
-        if STATE["opponents"]["encounters"]:
+        if opponent_table() is not None:
             return
+        url = opponents_sheet_url()
         starter = (STATE.get("settings", {}) or {}).get("starter", "Bulbasaur")
-        encounters = _build_encounters_for(starter, DEFAULT_SHEET_URL)
+        encounters, source = encounters_for(starter, url, tabs)
         if encounters:
-            STATE["opponents"]["encounters"] = encounters
-            STATE["opponents"]["meta"]["sheet_url"] = DEFAULT_SHEET_URL
-            STATE["opponents"]["meta"]["last_loaded"] = f"starter={starter}"
-            save_state(STATE)
+            _install_encounters(encounters, url, starter, source)
     except Exception:
         pass
 
@@ -2038,27 +4039,21 @@ def available_evos_for(species_name: str) -> List[Dict]:
 def evolve_mon_record(mon: Dict, to_species_name: str, rebuild_moves: bool=False):
     ensure_species_in_db(to_species_name)
     sk = species_key(to_species_name)
-    sp = STATE["species_db"].get(sk)
+    sp = species_db().get(sk)
     if not sp:
         return False
-    if not sp.get("learnset"):
-        merged = rebuild_learnset_for(sp["name"])
-        if merged:
-            sp["learnset"] = merged
-            STATE["species_db"][sk] = sp
-            save_state(STATE)
     mon["species"] = sp["name"]
     mon["species_key"] = sk
     mon["types"] = purge_fairy_types_pair(sp["types"])
     mon["total"] = sp["total"]
     if rebuild_moves:
-        learned = last_four_moves_by_level(sp.get("learnset", {}), int(mon.get("level",1)))
+        learned = last_four_moves_by_level(sp.get("learnset") or shared_learnset(sp["name"]), int(mon.get("level",1)))
         typed: List[Tuple[str,str]] = []
         for m in learned:
             info = lookup_move(m)
             if info and not info.get("is_damaging", True):
                 continue
-            mtype = normalize_type((info.get("type") if info else None) or STATE["moves_db"].get(norm_key(m),{}).get("type",""))
+            mtype = normalize_type((info.get("type") if info else None) or moves_db().get(norm_key(m),{}).get("type",""))
             if mtype: typed.append(((info["name"] if info else m), mtype))
         mon["moves"] = typed
     return True
@@ -2102,7 +4097,8 @@ TYPE_CHART: Dict[str, Dict[str, float]] = {
     "Steel": {"Fire":0.5,"Water":0.5,"Electric":0.5,"Ice":2.0,"Rock":2.0,"Steel":0.5}
 }
 
-def get_mult(move_type: str, defender_types: Tuple[Optional[str], Optional[str]]) -> float:
+def _chart_mult(move_type: str, defender_types) -> float:
+    # Reference implementation: the type tables below are generated from it.
     if not move_type: return 1.0
     move_type = normalize_type(move_type) or "Normal"
     m = 1.0
@@ -2122,72 +4118,325 @@ def get_mult(move_type: str, defender_types: Tuple[Optional[str], Optional[str]]
 def score_offense(mult: float) -> int: return OFFENSE_SCORE.get(mult,0)
 def score_defense(mult: float) -> int: return DEFENSE_SCORE.get(mult,0)
 
+# Fixed/set-HP and OHKO moves ignore type effectiveness except immunities.
+# Gen 3 set: Seismic Toss, Night Shade, Dragon Rage, SonicBoom, Psywave, Super Fang, Endeavor,
+#            Fissure, Guillotine, Horn Drill, Sheer Cold
+IMMUNITY_ONLY_MOVES = {
+    "seismictoss",
+    "nightshade",
+    "dragonrage",
+    "sonicboom",
+    "psywave",
+    "superfang",
+    "endeavor",
+    "fissure",
+    "guillotine",
+    "horndrill",
+    "sheercold",
+}
+
+def _chart_immunity_only_mult(move_type: str, defender_types) -> float:
+    """Apply ONLY immunities (0x) from the type chart; ignore resist/weak."""
+    mt = normalize_type(move_type) or "Normal"
+    for dt in defender_types:
+        if not dt:
+            continue
+        d = normalize_type(dt) or "Normal"
+        if TYPE_CHART.get(mt, {}).get(d, 1.0) == 0.0:
+            return 0.0
+    return 1.0
+
+# Every (attacking type, defender type 1, defender type 2) answer, precomputed
+# from the two functions above and indexed by integer type id. Id NO_TYPE
+# stands for an empty slot or a type the chart doesn't know; both are neutral.
+# Cells are (multiplier, offense score, defense score), flat-indexed by
+# type_cell(variant, attack, def1, def2); variant 0 = normal chart, 1 = immunity-only.
+TYPE_IDS = {t: i for i, t in enumerate(TYPES)}
+NO_TYPE = len(TYPES)
+TYPE_SLOTS = NO_TYPE + 1
+NORMAL_TYPE = TYPE_IDS["Normal"]
+
+def type_cell(variant: int, attack: int, def1: int, def2: int) -> int:
+    return ((variant * TYPE_SLOTS + attack) * TYPE_SLOTS + def1) * TYPE_SLOTS + def2
+
+@st.cache_resource(show_spinner=False)
+def _type_cells_for_process() -> Tuple[Tuple[float, int, int], ...]:
+    attackers = TYPES + ["(unknown)"]  # an empty move type is handled by move_matchup
+    defenders = TYPES + [None]
+    cells = []
+    for fn in (_chart_mult, _chart_immunity_only_mult):
+        for a in attackers:
+            for d1 in defenders:
+                for d2 in defenders:
+                    m = fn(a, (d1, d2))
+                    cells.append((m, score_offense(m), score_defense(m)))
+    return tuple(cells)
+
+def type_cells() -> Tuple[Tuple[float, int, int], ...]:
+    return _run_memo("type_cells", _type_cells_for_process)
+
+_TYPE_ID_MEMO: Dict[Optional[str], int] = {}
+_IMMUNITY_ONLY_MEMO: Dict[str, bool] = {}
+
+def type_id(t: Optional[str]) -> int:
+    i = _TYPE_ID_MEMO.get(t)
+    if i is None:
+        i = _TYPE_ID_MEMO[t] = TYPE_IDS.get(normalize_type(t) or "", NO_TYPE)
+    return i
+
+def is_immunity_only_move(move_name: Optional[str]) -> bool:
+    if not move_name:
+        return False
+    hit = _IMMUNITY_ONLY_MEMO.get(move_name)
+    if hit is None:
+        hit = _IMMUNITY_ONLY_MEMO[move_name] = move_id(move_name) in IMMUNITY_ONLY_MOVES
+    return hit
+
+def move_attack_key(move_name: Optional[str], move_type: str,
+                    immunity_only: Optional[bool] = None) -> Tuple[int, int]:
+    """(variant, attack id) of a move: its first two type_cell coordinates."""
+    if immunity_only is None:
+        immunity_only = is_immunity_only_move(move_name)
+    # No move type: neutral on the normal chart, Normal for immunities (as the chart functions do)
+    if immunity_only:
+        return 1, (type_id(move_type) if move_type else NORMAL_TYPE)
+    return 0, (type_id(move_type) if move_type else NO_TYPE)
+
+def move_matchup(move_name: Optional[str], move_type: str, defender_types,
+                 immunity_only: Optional[bool] = None) -> Tuple[float, int, int]:
+    """
+    (multiplier, offense score, defense score) of one move against a typing.
+    Fixed/set-HP and OHKO moves ignore type effectiveness except immunities;
+    everything else uses the normal type chart.
+    """
+    if immunity_only is None:
+        immunity_only = is_immunity_only_move(move_name)
+    if len(defender_types) == 2:
+        d1, d2 = defender_types
+    else:
+        present = [dt for dt in defender_types if dt]
+        if len(present) > 2:  # not a real Pokémon: use the chart directly
+            m = (_chart_immunity_only_mult if immunity_only else _chart_mult)(move_type, defender_types)
+            return m, score_offense(m), score_defense(m)
+        d1, d2 = (present + [None, None])[:2]
+    variant, a = move_attack_key(move_name, move_type, immunity_only)
+    return type_cells()[type_cell(variant, a, type_id(d1), type_id(d2))]
+
+def get_mult(move_type: str, defender_types: Tuple[Optional[str], Optional[str]]) -> float:
+    return move_matchup(None, move_type, defender_types, immunity_only=False)[0]
+
+# ---- Batch matchups ----
+# The same cells as one (variant, attack, def1, def2) array per field, so a
+# whole team can be scored against a whole party, or every remaining
+# encounter, in a few array operations instead of a Python loop per move.
+@st.cache_resource(show_spinner=False)
+def _type_arrays_for_process() -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    cells = _type_cells_for_process()
+    shape = (2, TYPE_SLOTS, TYPE_SLOTS, TYPE_SLOTS)
+    mult = np.array([c[0] for c in cells], dtype=np.float64).reshape(shape)
+    off = np.array([c[1] for c in cells], dtype=np.int16).reshape(shape)
+    dfn = np.array([c[2] for c in cells], dtype=np.int16).reshape(shape)
+    for arr in (mult, off, dfn):
+        arr.setflags(write=False)
+    return mult, off, dfn
+
+def type_arrays() -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    return _run_memo("type_arrays", _type_arrays_for_process)
+
+def _pack_movesets(movesets) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """Variant, attack id, presence and has-a-name arrays, one row per moveset, padded to the widest."""
+    width = max([len(ms) for ms in movesets] + [1])
+    variant = np.zeros((len(movesets), width), dtype=np.intp)
+    attack = np.full((len(movesets), width), NO_TYPE, dtype=np.intp)
+    present = np.zeros((len(movesets), width), dtype=bool)
+    named = np.zeros((len(movesets), width), dtype=bool)
+    for i, ms in enumerate(movesets):
+        for j, (mv, t) in enumerate(ms):
+            variant[i, j], attack[i, j] = move_attack_key(mv, t)
+            present[i, j] = True
+            named[i, j] = mv is not None
+    return variant, attack, present, named
+
+def _pack_typings(typings) -> np.ndarray:
+    ids = [(type_id(t1), type_id(t2)) for t1, t2 in typings]
+    return np.array(ids, dtype=np.intp).reshape(len(ids), 2)
+
+class MatchupGrid:
+    """
+    A team scored against a list of opponents. Score arrays are (team, opponent);
+    `*_move` holds the index of the chosen move (-1: no moves, scored 0 at 1x),
+    and the per-move arrays are (team, move, opponent) for offense and
+    (team, opponent, move) for defense.
+    """
+    __slots__ = ("team_moves", "opp_moves", "off_mult", "off_score", "def_mult", "def_score",
+                 "offense", "offense_move", "offense_mult",
+                 "defense", "defense_move", "defense_mult", "total")
+
+    def offense_at(self, i: int, j: int):
+        """((score, move, multiplier), per-move rows) for team member i attacking opponent j."""
+        moves = self.team_moves[i]
+        rows = [{"move": mv, "type": t, "mult": float(self.off_mult[i, k, j]),
+                 "score": int(self.off_score[i, k, j])} for k, (mv, t) in enumerate(moves)]
+        k = int(self.offense_move[i, j])
+        best = (int(self.offense[i, j]), moves[k][0] if k >= 0 else None, float(self.offense_mult[i, j]))
+        return best, rows
+
+    def defense_at(self, i: int, j: int):
+        """((score, move, multiplier), per-move rows) for opponent j attacking team member i."""
+        moves = self.opp_moves[j]
+        rows = [{"move": mv, "type": t, "mult": float(self.def_mult[i, j, k]),
+                 "score": int(self.def_score[i, j, k])} for k, (mv, t) in enumerate(moves)]
+        k = int(self.defense_move[i, j])
+        best = (int(self.defense[i, j]), moves[k][0] if k >= 0 else None, float(self.defense_mult[i, j]))
+        return best, rows
+
+def _pick_moves(scores: np.ndarray, mults: np.ndarray, present: np.ndarray, axis: int, highest: bool):
+    """Best score per cell along the move axis (first move wins ties), its index and multiplier."""
+    if highest:
+        pick = np.argmax(np.where(present, scores, np.iinfo(scores.dtype).min), axis=axis)
+    else:
+        pick = np.argmin(np.where(present, scores, np.iinfo(scores.dtype).max), axis=axis)
+    pick = np.expand_dims(pick, axis)
+    any_move = present.any(axis=axis)
+    score = np.where(any_move, np.take_along_axis(scores, pick, axis).squeeze(axis), 0)
+    mult = np.where(any_move, np.take_along_axis(mults, pick, axis).squeeze(axis), 1.0)
+    return score, np.where(any_move, pick.squeeze(axis), -1), mult
+
+def battle_matchups(team_moves, team_types, opp_moves, opp_types) -> MatchupGrid:
+    """
+    Score every team member against every opponent at once, with the same
+    rules as move_matchup: offense is our best move against their typing,
+    defense their best move against ours, total is the sum.
+    Moves are lists of (name, type); types are (type1, type2) pairs.
+    """
+    mult_t, off_t, def_t = type_arrays()
+    my_var, my_atk, my_has, my_named = _pack_movesets(team_moves)
+    op_var, op_atk, op_has, _ = _pack_movesets(opp_moves)
+    my_def, op_def = _pack_typings(team_types), _pack_typings(opp_types)
+
+    g = MatchupGrid()
+    g.team_moves, g.opp_moves = team_moves, opp_moves
+    # Our moves (team, move, 1) against their typings (1, 1, opponent)
+    cell = (my_var[:, :, None], my_atk[:, :, None], op_def[None, None, :, 0], op_def[None, None, :, 1])
+    g.off_mult, g.off_score = mult_t[cell], off_t[cell]
+    present = np.broadcast_to(my_has[:, :, None], g.off_score.shape)
+    g.offense, g.offense_move, g.offense_mult = _pick_moves(g.off_score, g.off_mult, present, 1, True)
+    # As in the per-move loop, a nameless best move counts as no move at all
+    unnamed = ~np.take_along_axis(my_named, np.maximum(g.offense_move, 0), 1) & (g.offense_move >= 0)
+    g.offense[unnamed], g.offense_move[unnamed], g.offense_mult[unnamed] = 0, -1, 1.0
+    # Their moves (1, opponent, move) against our typings (team, 1, 1)
+    cell = (op_var[None, :, :], op_atk[None, :, :], my_def[:, None, None, 0], my_def[:, None, None, 1])
+    g.def_mult, g.def_score = mult_t[cell], def_t[cell]
+    present = np.broadcast_to(op_has[None, :, :], g.def_score.shape)
+    g.defense, g.defense_move, g.defense_mult = _pick_moves(g.def_score, g.def_mult, present, 2, False)
+    g.total = g.offense + g.defense
+    return g
+
 # =============================================================================
 # Forced loading gate
 # =============================================================================
+# Startup downloads run side by side; each gets its own time limit (seconds).
+# Optional ones that fail or run late are skipped, required ones stop the page.
+BOOTSTRAP_JOBS = {
+    "pokedex":   "Pokédex",
+    "learnsets": "learnsets",
+    "gen3":      "Gen3 levels",
+    "moves":     "moves",
+    "opponents": "opponents sheet",
+}
+
+def _bootstrap_job_optional(name: str) -> bool:
+    return name == "opponents" or bool(DATASETS.get(name, {}).get("optional"))
+
 def ensure_bootstrap_ready():
     progress = st.empty()
     bar = progress.progress(0, text="Loading base data...")
+    jobs = {n: (load_dataset, n) for n in DATASETS}
+    # A shipped encounter pack replaces the sheet download entirely
+    packed = pack_has((STATE.get("settings", {}) or {}).get("starter", "Bulbasaur"), opponents_sheet_url())
+    if opponent_table() is None and not packed:
+        jobs["opponents"] = (fetch_sheet_tabs, opponents_sheet_url())
+    total = len(jobs) + 2  # + species tables + opponents parse
     step = 0
+    results: Dict[str, object] = {}
+    failed: Dict[str, str] = {}
+    pool = ThreadPoolExecutor(max_workers=len(jobs), thread_name_prefix="frlg-boot")
     try:
-        get_pokedex_cached(); step += 1; bar.progress(int(step/6*100), text="Loaded Pokédex")
-        get_showdown_learnsets_cached(); step += 1; bar.progress(int(step/6*100), text="Loaded learnsets")
-        get_gen3_data_cached(); step += 1; bar.progress(int(step/6*100), text="Loaded Gen3 levels")
-        load_moves_master(); step += 1; bar.progress(int(step/6*100), text="Loaded moves")
-        if not STATE.get("species_db"):
-            base = build_state_from_web_cached(dex_max())
-            STATE["moves_db"] = base["moves_db"]
-            STATE["species_db"] = base["species_db"]
-            # no save_state here; per-session only
-        step += 1; bar.progress(int(step/6*100), text="Species ready")
-        autoload_opponents_if_empty(); step += 1; bar.progress(int(step/6*100), text="Opponents ready")
+        started = time.monotonic()
+        futs = {pool.submit(fn, arg): name for name, (fn, arg) in jobs.items()}
+        pending = set(futs)
+        while pending:
+            now = time.monotonic()
+            left = min(started + BOOTSTRAP_TIMEOUTS.get(futs[f], 60) - now for f in pending)
+            done, pending = wait(pending, timeout=max(left, 0), return_when=FIRST_COMPLETED)
+            for f in done:
+                name = futs[f]
+                try:
+                    results[name] = f.result()
+                except Exception as e:
+                    failed[name] = str(e) or type(e).__name__
+                step += 1
+                bar.progress(int(step/total*100), text=f"Loaded {BOOTSTRAP_JOBS.get(name, name)}")
+            for f in list(pending):
+                name = futs[f]
+                if time.monotonic() - started >= BOOTSTRAP_TIMEOUTS.get(name, 60):
+                    pending.discard(f)
+                    failed[name] = "timed out"
+                    step += 1
+                    bar.progress(int(step/total*100), text=f"Skipped {BOOTSTRAP_JOBS.get(name, name)}")
+        pool.shutdown(wait=False, cancel_futures=True)
+
+        required = [n for n in failed if not _bootstrap_job_optional(n)]
+        if required:
+            progress.empty()
+            st.error("Could not load base data: " + "; ".join(
+                f"{BOOTSTRAP_JOBS.get(n, n)} ({failed[n]})" for n in required))
+            st.stop()
+        for n in failed:
+            if n in DATASETS:
+                _give_up_on_dataset(n)
+
+        load_moves_master()
+        shared_game_data(dex_max())
+        step += 1; bar.progress(int(step/total*100), text="Species ready")
+        if "opponents" in results or packed:
+            autoload_opponents_if_empty(results.get("opponents"))
+        step += 1; bar.progress(int(step/total*100), text="Opponents ready")
+        save_warm_snapshot_async()
+        build_species_bundle_async()
+        warned = st.session_state.setdefault("_boot_warned", set())
+        if set(failed) - warned:
+            warned.update(failed)
+            st.warning("Started without: " + ", ".join(
+                f"{BOOTSTRAP_JOBS.get(n, n)} ({failed[n]})" for n in failed))
     finally:
+        pool.shutdown(wait=False, cancel_futures=True)
         bar.progress(100, text="Ready")
         progress.empty()
 
-ensure_bootstrap_ready()
-if not STATE.get("species_db"):
-    base = build_state_from_web_cached(dex_max())
-    STATE["moves_db"] = base["moves_db"]
-    STATE["species_db"] = base["species_db"]
-    STATE["meta"] = base.get("meta", {"species_scope": str(dex_max())})  # <<< ADD THIS LINE
+if not CLI_MODE:
+    ensure_bootstrap_ready()
 
 # =============================================================================
 # UI helpers
 # =============================================================================
-@st.cache_data(show_spinner=False)
-def _dex_num_for_name_cached(name: str) -> Optional[int]:
+@bounded_cache(max_entries=1024)
+def _dex_num_for_name_cached(name: str, pokedex_fingerprint: str) -> Optional[int]:
     """
     Map a species name to its Pokédex number (within current scope) so we can
     build a stable sprite URL. Uses the same Showdown pokedex data as the rest
-    of the app.
+    of the app (pokedex_fingerprint keys the cache to that data).
     """
     if not name:
         return None
     try:
-        dex = get_pokedex_cached() or {}
+        index = dex_index()
     except Exception:
         return None
 
     # Clean up weird spaces / non-breaking spaces from sheet etc.
-    cleaned = clean_invisibles(str(name))
-    sid = ps_id(cleaned)
-    maxdex = 386
-
-    rec = dex.get(sid)
-    if rec and isinstance(rec.get("num"), int) and 1 <= rec["num"] <= maxdex and not rec.get("forme"):
-        return rec["num"]
-
-    # Fallback: scan by normalized name
-    for r in dex.values():
-        if not r:
-            continue
-        nm = r.get("name", "")
-        if ps_id(nm) == sid and not r.get("forme"):
-            num = r.get("num")
-            if isinstance(num, int) and 1 <= num <= maxdex:
-                return num
-    return None
+    rec = index.lookup(clean_invisibles(str(name)), 386)
+    return rec["num"] if rec else None
 
 
 def _bulba_frlg_sprite_url(num: int) -> Optional[str]:
@@ -2215,7 +4464,10 @@ def sprite_url_for_species(name: str) -> Optional[str]:
     Return a FRLG-style front sprite URL for any Gen 3 species (1–386).
     Uses Bulbagarden Archives 'Spr_3r_XXX.png' with computed MD5 path.
     """
-    num = _dex_num_for_name_cached(name)
+    try:
+        num = _dex_num_for_name_cached(name, dataset_fingerprint("pokedex"))
+    except Exception:
+        return None
     if not num:
         return None
     return _bulba_frlg_sprite_url(num)
@@ -2305,7 +4557,7 @@ FRLG_TRAINER_CLASS_KEYWORDS = [
     ("Elite Four Lance", ["lance"]),
 ]
 
-@st.cache_data(show_spinner=False)
+@bounded_cache(max_entries=1024)
 def trainer_class_from_label(label: str) -> str:
     """
     Map a sheet label like 'Youngster Joey #2' or 'Rocket Grunt 3'
@@ -2514,16 +4766,16 @@ def _blue_sprite_filename_for_meeting(label: str) -> Optional[str]:
 
     # 2) Meeting index fallback based on encounter order
     try:
-        encs = (STATE.get("opponents", {}) or {}).get("encounters", []) or []
+        encs = remaining_parties()
     except Exception:
         encs = []
 
     meeting = 0
-    for enc in encs:
-        base = f"{enc.get('label','')} {enc.get('base_label','')}".lower()
+    for enc_label, enc_base, _mons in encs:
+        base = f"{enc_label} {enc_base}".lower()
         if any(k in base for k in ("rival", "blue", "gary")):
             meeting += 1
-            if enc.get("label") == label_str:
+            if enc_label == label_str:
                 if meeting <= 3:
                     return BLUE_SPRITE_VARIANTS["blue1"]
                 elif meeting <= 7:
@@ -2574,6 +4826,17 @@ def trainer_sprite_img_html(label: str, size: int = None) -> str:
         f'width="{s}" height="{s}" alt="{safe_label} trainer sprite"/>'
     )
 
+@st.cache_resource(show_spinner=False, max_entries=4)
+def _scope_legal_damaging_for(maxdex: int, fingerprints: Tuple[str, ...]) -> FrozenSet[str]:
+    table = family_legal_table(maxdex)
+    allowed = set()
+    for sp in _shared_game_data_for(maxdex, fingerprints).species.values():
+        for mv in table.get(ps_id(sp.name), ()):
+            nm = (lookup_move(mv) or {}).get("name", clean_move_token(mv))
+            if nm and move_is_damaging(nm):
+                allowed.add(nm)
+    return frozenset(allowed)
+
 def _frlg_allowed_damaging_moves_set() -> set:
     """
     Union of *all* damaging FRLG-legal moves across in-scope species:
@@ -2581,20 +4844,17 @@ def _frlg_allowed_damaging_moves_set() -> set:
     - TM/HM (3M)
     - Tutor (3T)
     Plus anything already seen on roster/opponents (so we never drop user data).
-    Cached per dex scope for speed.
+    The species part is shared per scope and data version; the session part
+    (sheet-only species, roster, opponents) is added on each call.
     """
-    cache = STATE.setdefault("_allowed_moves_cache", {})
-    scope_key = f"scope_{dex_max()}"
-    if scope_key in cache:
-        return set(cache[scope_key])
-
-    allowed = set()
+    maxdex = dex_max()
+    fps = _game_data_fingerprints()
+    allowed = set(_run_memo(("scope_legal", maxdex, fps), lambda: _scope_legal_damaging_for(maxdex, fps)))
 
-    # Pull from canonical FRLG resolver (includes 3L, 3M, 3T)
+    # Species this session pulled in beyond the shared table
     try:
-        for sp in (STATE.get("species_db", {}) or {}).values():
-            name = sp.get("name", "")
-            for mv in (legal_moves_for_species_chain(name) or []):
+        for sp in (STATE.get("species_db") or {}).values():
+            for mv in legal_moves_for_species_chain(sp.get("name", "")):
                 nm = (lookup_move(mv) or {}).get("name", clean_move_token(mv))
                 if nm and move_is_damaging(nm):
                     allowed.add(nm)
@@ -2610,15 +4870,14 @@ def _frlg_allowed_damaging_moves_set() -> set:
     except Exception:
         pass
     try:
-        for enc in STATE.get("opponents", {}).get("encounters", []) or []:
-            for mon in enc.get("mons", []) or []:
-                for nm, _tp in mon.get("moves", []) or []:
+        for _label, _base, mons in remaining_parties():
+            for mon in mons:
+                for nm, _tp in mon.moves:
                     if nm and move_is_damaging(nm):
                         allowed.add(nm)
     except Exception:
         pass
 
-    cache[scope_key] = list(sorted(allowed))
     return allowed
 
 def all_damaging_moves_sorted() -> List[str]:
@@ -2653,7 +4912,7 @@ def canonical_typed(move_name: str) -> Optional[Tuple[str, str]]:
 
     mtype = normalize_type(
         (info.get("type") if info else None)
-        or STATE["moves_db"].get(norm_key(nm), {}).get("type", "")
+        or moves_db().get(norm_key(nm), {}).get("type", "")
     )
     if not mtype:
         return None
@@ -2751,13 +5010,11 @@ def render_settings():
     st.header("Settings")
 
     # Reset session
+    # Shared caches are keyed by data fingerprints, so a reset never needs to
+    # clear them (that would make every other session rebuild at once).
     if st.button("Reset this session (start fresh)", key="reset_session_btn"):
         for k in list(st.session_state.keys()):
             del st.session_state[k]
-        try:
-            st.cache_data.clear()
-        except Exception:
-            pass
         st.rerun()
     st.caption("Per-user session only. No data is written to the server.")
     st.markdown("---")
@@ -2807,6 +5064,23 @@ def render_settings():
         st.success(f"Starter set to {starter_new}. Opponents reloaded.")
         do_rerun()
 
+    # Pick up edits to the opponents sheet without losing the run's progress
+    refreshed = st.session_state.pop("_opponents_refresh", None)
+    from_pack = STATE["opponents"]["meta"].get("source") == "pack"
+    if st.button("Refresh opponents from " + ("encounter pack" if from_pack else "sheet"),
+                 key="refresh_opponents_btn",
+                 help=("Reads the shipped encounter pack again" if from_pack else "Downloads the sheet again")
+                      + "; trainers and Pokémon you've beaten stay beaten."):
+        try:
+            with st.spinner("Checking the opponents…"):
+                st.session_state["_opponents_refresh"] = refresh_opponents()
+        except Exception as e:
+            st.error(f"Couldn't refresh opponents: {e}")
+        else:
+            do_rerun()
+    if refreshed:
+        st.caption("Opponents refreshed: " + ", ".join(f"{n} {k}" for k, n in refreshed.items()))
+
         # Pokédex scope (151 vs 386)
     scope_cur = (STATE.get("settings", {}).get("dex_scope", "151"))
     scope_disp = "Gen 1–3 (386)" if scope_cur == "386" else "Kanto 151"
@@ -2819,14 +5093,45 @@ def render_settings():
     scope_new = "386" if scope_pick == "Gen 1–3 (386)" else "151"
     if scope_new != scope_cur:
         STATE["settings"]["dex_scope"] = scope_new
-        base = build_state_from_web_cached(dex_max())
-        STATE["moves_db"] = base["moves_db"]
-        STATE["species_db"] = base["species_db"]
-        STATE["meta"] = base.get("meta", {"species_scope": str(dex_max())})
+        STATE["species_db"] = {}
+        STATE["moves_db"] = {}
+        shared_game_data(dex_max())
         save_state(STATE)
         st.success(f"Pokédex scope set to {scope_pick}. Reloaded species database.")
         do_rerun()
 
+    with st.expander("Cache diagnostics", expanded=False):
+        rows = bounded_cache_stats()
+        if rows:
+            st.table(rows)
+        else:
+            st.caption("No cached lookups yet.")
+        flights = single_flight().stats()
+        if flights:
+            st.caption("Shared builds (runs: done here; joined: waited on another session's run)")
+            st.table(flights)
+
+    with st.expander("Data sources", expanded=False):
+        st.table(dataset_status())
+        pack = encounter_pack()
+        if pack:
+            st.caption(f"Opponents: encounter pack compiled {pack['compiled_at']} "
+                       f"({', '.join(pack['starters'])}) from {ENCOUNTER_PACK_PATH}")
+        result = st.session_state.pop("_refresh_result", None)
+        if result:
+            st.table([{"dataset": n, "result": r} for n, r in result.items()])
+        if ADMIN_TOKEN:
+            token = st.text_input("Admin token", type="password", key="admin_token_input")
+            if st.button("Refresh changed sources", key="refresh_sources_btn"):
+                if hmac.compare_digest(token.encode("utf-8"), ADMIN_TOKEN.encode("utf-8")):
+                    with st.spinner("Checking upstream data…"):
+                        st.session_state["_refresh_result"] = refresh_datasets()
+                    st.rerun()
+                else:
+                    st.error("Wrong admin token.")
+        else:
+            st.caption("Set FRLG_ADMIN_TOKEN on the server to refresh sources from here.")
+
 
 def render_pokedex():
     st.header("Pokédex")
@@ -2883,7 +5188,7 @@ def render_pokedex():
                         st.markdown(sprite_html, unsafe_allow_html=True)
                     lvl = int(STATE.get("settings",{}).get("default_level", 20))
                     sk = species_key(species_name)
-                    sp = STATE["species_db"][sk]
+                    sp = species_db()[sk]
                     try:
                         proposed = get_prefill_moves(sp, lvl) or []
                     except Exception:
@@ -2900,12 +5205,12 @@ def render_pokedex():
                             st.session_state[f"add_mv_{j+1}"] = proposed[j] if j < len(proposed) else "(none)"
                         st.session_state["add_species_prev"] = species_name
 
-                    all_moves = ["(none)"] + (legal_moves_for_species_chain(species_name) or [])
+                    all_moves = ["(none)", *legal_moves_for_species_chain(species_name)]
                     c1, c2, c3, c4 = st.columns(4)
                     picks = []
                     for j, col in enumerate((c1, c2, c3, c4), start=1):
                         cur = st.session_state.get(f"add_mv_{j}", proposed[j-1])
-                        opts = ["(none)"] + (legal_moves_for_species_chain(species_name) or [])
+                        opts = ["(none)", *legal_moves_for_species_chain(species_name)]
                         if cur not in opts and cur.lower() not in FRLG_EXCLUDE_MOVES:
                             opts.insert(1, cur)
                         sel = col.selectbox(
@@ -3166,7 +5471,7 @@ def render_pokedex():
             cols4 = st.columns(4)
             for j in range(4):
                 cur = picks[j]
-                opts = ['(none)'] + (legal_moves_for_species_chain(mon.get('species', '')) or [])
+                opts = ['(none)', *legal_moves_for_species_chain(mon.get('species', ''))]
                 if cur not in opts and cur.lower() not in FRLG_EXCLUDE_MOVES:
                     opts.insert(1, cur)
                 sel = cols4[j].selectbox(
@@ -3291,7 +5596,7 @@ def render_pokedex():
                 cols4 = st.columns(4)
                 for j in range(4):
                     cur = picks[j]
-                    opts = ['(none)'] + (legal_moves_for_species_chain(mon.get('species', '')) or [])
+                    opts = ['(none)', *legal_moves_for_species_chain(mon.get('species', ''))]
                     if cur not in opts and cur.lower() not in FRLG_EXCLUDE_MOVES:
                         opts.insert(1, cur)
                     sel = cols4[j].selectbox(
@@ -3363,14 +5668,6 @@ def available_species_entries() -> List[Tuple[str, str]]:
     - Preserve '[trade reward]' tag.
     - Hide Mew from Add list when disabled in Settings.
     """
-    # Guard: rebuild if species DB scope mismatches current setting
-    want = str(dex_max())
-    if (STATE.get("meta", {}).get("species_scope") != want):
-        base = build_state_from_web_cached(dex_max())
-        STATE["moves_db"] = base["moves_db"]
-        STATE["species_db"] = base["species_db"]
-        STATE["meta"] = base.get("meta", {"species_scope": want})
-
     catch_unlimited = bool(STATE.get("settings", {}).get("catch_unlimited", False))
     # (rest of your function stays exactly as you have it)
 
@@ -3383,7 +5680,8 @@ def available_species_entries() -> List[Tuple[str, str]]:
     ever = set(STATE.get("fulfilled_ever", []))
     entries: List[Tuple[str, str]] = []
 
-    for sk, sp in STATE.get("species_db", {}).items():
+    # Scope table only; species pulled in from the opponents sheet stay out of the list
+    for sk, sp in shared_game_data().species.items():
         name = sp.get("name", "")
         if not name:
             continue
@@ -3494,6 +5792,68 @@ def _moves_grid_html(rows, offense: bool) -> str:
 def _render_moves_grid(rows, offense: bool):
     st.markdown(_moves_grid_html(rows, offense=offense), unsafe_allow_html=True)
 
+def battle_moves_for(mon: Dict) -> List[Tuple[str, str]]:
+    """A team member's (move, type) list: its recorded moves, else the last four it knows by level."""
+    my_moves = [(mv, normalize_type(tp) or "") for mv, tp in (mon.get("moves") or [])]
+    # The shared learnset needs no species_db() entry (a save doesn't carry the session layer)
+    learnset = shared_learnset(mon["species"]) if not my_moves else None
+    if learnset:
+        learned = last_four_moves_by_level(learnset, int(mon["level"]))
+        typed = []
+        for m in learned:
+            ct = canonical_typed(m)
+            if ct:
+                typed.append(ct)
+        my_moves = typed
+    return my_moves
+
+def _opponent_inputs(mons: List[OpponentMon]):
+    """(movesets, typings) of opponent mons, as battle_matchups takes them."""
+    return [list(m.moves) for m in mons], [m.types for m in mons]
+
+def party_overview(grid: MatchupGrid, team: List[Dict], party: List[OpponentMon]) -> List[Dict]:
+    """One row per team member: total score against each of the trainer's mons, and the sum."""
+    rows = []
+    for i, mon in enumerate(team):
+        row = {"Your Pokémon": f"{mon.get('species', '?')} Lv{int(mon.get('level', 1))}"}
+        for j, opp in enumerate(party):
+            row[f"{j + 1}. {opp.species} Lv{opp.level}"] = int(grid.total[i, j])
+        row["Sum"] = int(grid.total[i].sum())
+        rows.append(row)
+    return rows
+
+def gauntlet_overview(team: List[Dict], team_moves, team_types,
+                      encounters: List[Tuple[str, str, List[OpponentMon]]]) -> List[Dict]:
+    """
+    One row per remaining encounter (label, base label, mons), from a single
+    grid over every opponent: the team member with the best summed score
+    against the party, and the opponent whose best answer scores lowest.
+    Encounters with no mons are left out.
+    """
+    parties = [mons for _label, _base, mons in encounters]
+    grid = battle_matchups(team_moves, team_types, *_opponent_inputs([m for p in parties for m in p]))
+    answer = grid.total.argmax(axis=0)  # best team member per opponent
+    answer_score = grid.total.max(axis=0)
+    rows, start = [], 0
+    for n, (enc, party) in enumerate(zip(encounters, parties), start=1):
+        stop = start + len(party)
+        if party:
+            sums = grid.total[:, start:stop].sum(axis=1)
+            lead = int(sums.argmax())
+            worst = start + int(answer_score[start:stop].argmin())
+            rows.append({
+                "#": n,
+                "Trainer": enc[0],
+                "Pokémon": len(party),
+                "Best lead": team[lead].get("species", "?"),
+                "Lead sum": int(sums[lead]),
+                "Toughest": party[worst - start].species,
+                "Answer": team[int(answer[worst])].get("species", "?"),
+                "Score": int(answer_score[worst]),
+            })
+        start = stop
+    return rows
+
 def render_battle():
     st.header("Battle")
     team = st.session_state.get("active_team", STATE["roster"][:6])
@@ -3554,15 +5914,22 @@ def render_battle():
         return
 
     # Load encounters if empty
-    if not STATE["opponents"]["encounters"]:
+    table = opponent_table()
+    if table is None:
         st.warning("No opponents loaded yet. Trying to load your default sheet…")
         autoload_opponents_if_empty()
-    if not STATE["opponents"]["encounters"]:
+        table = opponent_table()
+    if table is None:
         st.error("Could not load opponents automatically.")
         return
+    # (encounter index, slots of the mons left) of every trainer not beaten yet
+    remaining = remaining_encounters(table, STATE["opponents"].get("beaten", 0))
+    if not remaining:
+        st.success("Every trainer on the list is beaten.")
+        return
 
     # Pick trainer + mon (instant updates; no form, no button)
-    enc_options = [f"{i+1}. {enc['label']}" for i, enc in enumerate(STATE["opponents"]["encounters"])]
+    enc_options = [f"{n+1}. {table.labels[i]}" for n, (i, _left) in enumerate(remaining)]
     cur_enc_idx, cur_mon_idx = STATE.get("last_battle_pick", [0, 0])
 
     cur_enc_idx = max(0, min(cur_enc_idx, len(enc_options) - 1)) if enc_options else 0
@@ -3577,8 +5944,8 @@ def render_battle():
         do_rerun()
 
     # Always resolve the encounter from the current index
-    enc = STATE["opponents"]["encounters"][selected_enc_idx]
-    mons = enc.get("mons", []) or []
+    enc_i, slots = remaining[selected_enc_idx]
+    mons = [table.mons[k] for k in slots]
     mon_count = len(mons)
 
     # Current selected mon index from state (for highlight)
@@ -3590,7 +5957,7 @@ def render_battle():
         )
         
         # Trainer sprite above their team
-    trainer_label = enc.get("label", "?")
+    trainer_label = table.labels[enc_i]
     trainer_html = trainer_sprite_img_html(trainer_label, size=TRAINER_SPRITE_SIZE)
     if trainer_html:
         st.markdown(trainer_html, unsafe_allow_html=True)
@@ -3636,12 +6003,11 @@ def render_battle():
                 is_selected = (idx == cur_mon_idx)
                 card_classes = "opp-card opp-card-selected" if is_selected else "opp-card"
 
-                species = mon.get("species", "?")
-                level = int(mon.get("level", 1))
-                total = int(mon.get("total", 0))
+                species = mon.species
+                level = mon.level
+                total = mon.total
 
-                types_pair = purge_fairy_types_pair(mon.get("types") or [])
-                t1, t2 = types_pair[0], types_pair[1]
+                t1, t2 = mon.types
 
                 if t1:
                     type_text = f"{type_emoji(t1)} {t1}"
@@ -3650,7 +6016,7 @@ def render_battle():
                 if t2:
                     type_text += f" / {t2}"
 
-                moves = mon.get("moves") or []
+                moves = mon.moves
                 moves_txt = ", ".join([f"{mv} ({tp})" for mv, tp in moves]) if moves else "—"
 
                 sprite_html = sprite_img_html(species, size=128)
@@ -3701,71 +6067,38 @@ def render_battle():
     # === Clamp indices and build opponent header ===
     selected_enc_idx, selected_mon_idx = STATE.get("last_battle_pick", [0, 0])
 
-    enc_count = len(STATE["opponents"]["encounters"])
-    if enc_count == 0:
-        st.error("No encounters loaded.")
-        return
-    selected_enc_idx = max(0, min(selected_enc_idx, enc_count - 1))
-    enc = STATE["opponents"]["encounters"][selected_enc_idx]
-
-    mon_count = len(enc.get("mons", []))
-    if mon_count == 0:
-        st.error("Selected encounter has no Pokémon.")
-        return
-    selected_mon_idx = max(0, min(selected_mon_idx, mon_count - 1))
+    selected_enc_idx = max(0, min(selected_enc_idx, len(remaining) - 1))
+    enc_i, slots = remaining[selected_enc_idx]
+    enc_label = table.labels[enc_i]
+    selected_mon_idx = max(0, min(selected_mon_idx, len(slots) - 1))
 
-    opmon = enc["mons"][selected_mon_idx]
-    opp_label = f"{enc.get('label', '?')} — {opmon.get('species', '?')} Lv{opmon.get('level', 1)}"
-    opp_types = tuple(purge_fairy_types_pair(opmon.get("types") or []))
+    opmon = table.mons[slots[selected_mon_idx]]
+    party = [table.mons[k] for k in slots]
+    opp_label = f"{enc_label} — {opmon.species} Lv{opmon.level}"
+    opp_types = opmon.types
     t1, t2 = opp_types
-    opp_pairs = list(opmon.get("moves", []))
-    opp_total = int(opmon.get("total", 0))
+    opp_pairs = list(opmon.moves)
+    opp_total = opmon.total
     moves_str = ", ".join([f"{n}({t})" for n, t in opp_pairs]) if opp_pairs else "—"
     # No separate text header here; trainer + sprite + actions are below.
-    current_opp_name = opmon.get("species", "?")
+    current_opp_name = opmon.species
 
     b1, b2 = st.columns(2)
     if b1.button("✅ Beat Pokémon (remove just this one)"):
         try:
-            # Decide next selection BEFORE mutating lists
             next_enc_idx = selected_enc_idx
             next_mon_idx = selected_mon_idx
 
-            if len(enc["mons"]) == 1:
-                # This was the only mon: remove the trainer, then stay on the same index (which becomes the next trainer)
-                STATE["opponents"]["cleared"].append(
-                    {
-                        "id": new_guid(),
-                        "what": "trainer",
-                        "trainer": enc["label"],
-                        "count": 1,
-                        "data": enc,
-                        "pos": selected_enc_idx,
-                    }
-                )
-                STATE["opponents"]["encounters"].pop(selected_enc_idx)
-                total = len(STATE["opponents"]["encounters"])
-                next_enc_idx = max(0, min(selected_enc_idx, total - 1))
+            if len(slots) == 1:
+                # This was the only mon: the trainer is done, and the same index becomes the next trainer
+                beat_opponents(table, enc_i, slots, "trainer")
+                next_enc_idx = max(0, min(selected_enc_idx, len(remaining) - 2))
                 next_mon_idx = 0
             else:
-                # Remove just the selected mon and point to whatever slid into that slot
-                beaten = enc["mons"].pop(selected_mon_idx)
-                STATE["opponents"]["cleared"].append(
-                    {
-                        "id": new_guid(),
-                        "what": "pokemon",
-                        "trainer": enc["label"],
-                        "species": beaten.get("species"),
-                        "level": beaten.get("level"),
-                        "row": beaten.get("source_row"),
-                        "data": beaten,
-                        "pos": selected_enc_idx,
-                        "index": selected_mon_idx,
-                    }
-                )
-                next_mon_idx = min(selected_mon_idx, len(enc["mons"]) - 1)
+                # Just the selected mon; point to whatever slid into that slot
+                beat_opponents(table, enc_i, [slots[selected_mon_idx]], "pokemon")
+                next_mon_idx = min(selected_mon_idx, len(slots) - 2)
 
-            save_state(STATE)
             STATE["last_battle_pick"] = [next_enc_idx, next_mon_idx]
             save_state(STATE)
             do_rerun()
@@ -3774,20 +6107,8 @@ def render_battle():
 
     if b2.button("🧹 Beat Trainer (remove entire encounter)"):
         try:
-            STATE["opponents"]["cleared"].append(
-                {
-                    "id": new_guid(),
-                    "what": "trainer",
-                    "trainer": enc["label"],
-                    "count": len(enc["mons"]),
-                    "data": enc,
-                    "pos": selected_enc_idx,
-                }
-            )
-            STATE["opponents"]["encounters"].pop(selected_enc_idx)
-
-            total = len(STATE["opponents"]["encounters"])
-            next_enc_idx = max(0, min(selected_enc_idx, total - 1))
+            beat_opponents(table, enc_i, slots, "trainer")
+            next_enc_idx = max(0, min(selected_enc_idx, len(remaining) - 2))
             STATE["last_battle_pick"] = [next_enc_idx, 0]
             save_state(STATE)
             do_rerun()
@@ -3799,137 +6120,39 @@ def render_battle():
         if not log:
             st.caption("— empty —")
         else:
-            current_labels = {enc2["label"] for enc2 in STATE["opponents"]["encounters"]}
+            beaten = STATE["opponents"].get("beaten", 0)
             for i, item in enumerate(list(reversed(log[-15:]))):
                 if item.get("what") == "pokemon":
                     label = (
                         f"• Beat Pokémon: {item.get('species')} (Lv{item.get('level')}) — "
                         f"Trainer: {item.get('trainer')}"
                     )
-                    can_undo = item.get("trainer") in current_labels
                 else:
                     label = (
                         f"• Beat Trainer: {item.get('trainer')} — "
                         f"removed {item.get('count', 0)} Pokémon"
                     )
-                    can_undo = item.get("trainer") not in current_labels
                 cols = st.columns([6, 1])
                 cols[0].write(label)
-                if can_undo:
+                if can_undo_cleared(item, beaten):
                     if cols[1].button("Undo", key=f"undo_{item.get('id', i)}"):
-                        if item.get("what") == "pokemon":
-                            for enc2 in STATE["opponents"]["encounters"]:
-                                if enc2["label"] == item["trainer"]:
-                                    enc2.setdefault("mons", []).append(item["data"])
-                                    break
-                        else:
-                            if item["trainer"] not in {e["label"] for e in STATE["opponents"]["encounters"]}:
-                                STATE["opponents"]["encounters"].insert(
-                                    min(
-                                        int(item.get("pos", 0)),
-                                        len(STATE["opponents"]["encounters"]),
-                                    ),
-                                    item["data"],
-                                )
+                        undo_cleared(item)
                         save_state(STATE)
                         st.success("Undo applied.")
                         do_rerun()
 
-    # === special type-math exceptions (fixed/set-HP, OHKO): ignore resist/weak; keep immunities ===
-    # Gen 3 set: Seismic Toss, Night Shade, Dragon Rage, SonicBoom, Psywave, Super Fang, Endeavor,
-    #            Fissure, Guillotine, Horn Drill, Sheer Cold
-    IMMUNITY_ONLY_MOVES = {
-        "seismictoss",
-        "nightshade",
-        "dragonrage",
-        "sonicboom",
-        "psywave",
-        "superfang",
-        "endeavor",
-        "fissure",
-        "guillotine",
-        "horndrill",
-        "sheercold",
-    }
-
-    def _immunity_only_mult(move_type: str, defender_types: tuple) -> float:
-        """Apply ONLY immunities (0x) from the type chart; ignore resist/weak."""
-        mt = normalize_type(move_type) or "Normal"
-        for dt in defender_types:
-            if not dt:
-                continue
-            d = normalize_type(dt) or "Normal"
-            if TYPE_CHART.get(mt, {}).get(d, 1.0) == 0.0:
-                return 0.0
-        return 1.0
-
-    def _type_mult_for_move(move_name: str, move_type: str, defender_types: tuple) -> float:
-        """
-        Fixed/set-HP and OHKO moves ignore type effectiveness except immunities.
-        Everything else uses normal type chart.
-        """
-        if move_name and move_id(move_name) in IMMUNITY_ONLY_MOVES:
-            return _immunity_only_mult(move_type, defender_types)
-        return get_mult(move_type, defender_types)
-
-    def compute_best_offense(my_moves, opp_types):
-        detail = []
-        best_score = -9999
-        best_move = None
-        best_mult = 1.0
-        for mv, t in my_moves:
-            mult = _type_mult_for_move(mv, t, opp_types)
-            sc = score_offense(mult)
-            detail.append({"move": mv, "type": t, "mult": mult, "score": sc})
-            if sc > best_score:
-                best_score, best_move, best_mult = sc, mv, mult
-        if best_move is None:
-            best_score, best_move, best_mult = 0, None, 1.0
-        return (best_score, best_move, best_mult), detail
-
-    def compute_their_best_vs_me(opp_moves, my_types):
-        detail = []
-        if not opp_moves:
-            return (0, None, 1.0), detail
-        best_score = 9999
-        best_move = None
-        best_mult = 1.0
-        for mv, t in opp_moves:
-            mult = _type_mult_for_move(mv, t, my_types)
-            sc = score_defense(mult)
-            detail.append({"move": mv, "type": t, "mult": mult, "score": sc})
-            if sc < best_score:
-                best_score, best_move, best_mult = sc, mv, mult
-        return (best_score, best_move, best_mult), detail
-
     # --- compute results ---
+    # The whole party is scored in one pass; the cards show the selected column.
+    team_moves = [battle_moves_for(mon) for mon in team]
+    team_types = [tuple(purge_fairy_types_pair(mon["types"])) for mon in team]
+    grid = battle_matchups(team_moves, team_types, *_opponent_inputs(party))
+
     results = []
-    for mon in team:
-        tpair = purge_fairy_types_pair(mon["types"])
-        my_types = (tpair[0], tpair[1])
+    for i, mon in enumerate(team):
         my_total = int(mon.get("total", 0))
-
-        sp = STATE["species_db"].get(
-            mon.get("species_key") or species_key(mon["species"]), {}
-        )
-        if not sp.get("learnset"):
-            sp["learnset"] = rebuild_learnset_for(sp.get("name", mon["species"]))
-            STATE["species_db"][species_key(sp.get("name", mon["species"]))] = sp
-            save_state(STATE)
-
-        my_moves = [(mv, normalize_type(tp) or "") for mv, tp in (mon.get("moves") or [])]
-        if not my_moves and sp.get("learnset"):
-            learned = last_four_moves_by_level(sp["learnset"], int(mon["level"]))
-            typed = []
-            for m in learned:
-                ct = canonical_typed(m)
-                if ct:
-                    typed.append(ct)
-            my_moves = typed
-
-        (off_sc, off_move, off_mult), off_rows = compute_best_offense(my_moves, opp_types)
-        (def_sc, def_move, def_mult), def_rows = compute_their_best_vs_me(opp_pairs, my_types)
-        total = off_sc + def_sc
+        (off_sc, off_move, off_mult), off_rows = grid.offense_at(i, selected_mon_idx)
+        (def_sc, def_move, def_mult), def_rows = grid.defense_at(i, selected_mon_idx)
+        total = int(grid.total[i, selected_mon_idx])
 
         results.append(
             {
@@ -3956,11 +6179,10 @@ def render_battle():
     st.subheader(f"Your team vs {current_opp_name}")
 
     # Opponent header info (same opponent every time; grid differs per your mon)
-    opp_species = opmon.get("species", "?")
-    opp_level   = int(opmon.get("level", 1))
-    opp_total   = int(opmon.get("total", 0))
-    opp_types_p = purge_fairy_types_pair(opmon.get("types") or [])
-    opp_t1, opp_t2 = opp_types_p[0], opp_types_p[1]
+    opp_species = opmon.species
+    opp_level   = opmon.level
+    opp_total   = opmon.total
+    opp_t1, opp_t2 = opmon.types
 
     opp_type_text = f"{type_emoji(opp_t1)} {opp_t1}" if opp_t1 else "—"
     if opp_t2:
@@ -4027,6 +6249,13 @@ def render_battle():
 
         st.markdown("<div style='height:10px'></div>", unsafe_allow_html=True)
 
+    with st.expander(f"Whole party: your team vs {enc_label}", expanded=False):
+        st.table(party_overview(grid, team, party))
+    with st.expander("Whole gauntlet: every remaining encounter", expanded=False):
+        st.caption("Lead sum: best team member's total across the party. "
+                   "Toughest: the mon whose best answer from your team scores lowest.")
+        st.table(gauntlet_overview(team, team_moves, team_types, remaining_parties()))
+
 # =============================================================================
 # Evolution Watch page
 # =============================================================================
@@ -4040,7 +6269,7 @@ def get_species_total(name: str) -> int:
     """
     try:
         sk = species_key(name)
-        rec = STATE.get("species_db", {}).get(sk)
+        rec = species_db().get(sk)
         if rec and isinstance(rec.get("total"), int):
             return int(rec["total"])
     except Exception:
@@ -4048,28 +6277,7 @@ def get_species_total(name: str) -> int:
 
     # 2) Direct from Pokédex if possible (handles evolved targets not preloaded)
     try:
-        dex = get_pokedex_cached() or {}
-        maxdex = dex_max()
-
-        def _dex_rec(n: str):
-            sid = ps_id(n)
-            sd = dex.get(sid)
-            if sd and (sd.get("forme") or not isinstance(sd.get("num"), int)):
-                sd = None
-            if sd and not (1 <= sd["num"] <= maxdex):
-                sd = None
-            if sd:
-                return sd
-            # fallback: scan by normalized name
-            for r in dex.values():
-                if not r: 
-                    continue
-                nm = r.get("name", "")
-                if ps_id(nm) == sid and not r.get("forme") and isinstance(r.get("num"), int) and 1 <= r["num"] <= maxdex:
-                    return r
-            return None
-
-        sd = _dex_rec(name)
+        sd = dex_lookup(name, dex_max())
         if sd:
             base = sd.get("baseStats") or {}
             if base:
@@ -4080,7 +6288,7 @@ def get_species_total(name: str) -> int:
     # 3) As a last resort, add it to species_db on demand and try again
     try:
         if ensure_species_in_db(name):
-            rec = STATE.get("species_db", {}).get(species_key(name))
+            rec = species_db().get(species_key(name))
             if rec and isinstance(rec.get("total"), int):
                 return int(rec["total"])
     except Exception:
@@ -4364,10 +6572,10 @@ def render_evo_watch():
 
                     # Target Pokémon types (bottom half) – ensure it exists
                     tgt_name = r.get("to", "?")
-                    tgt_rec = STATE.get("species_db", {}).get(species_key(tgt_name))
+                    tgt_rec = species_db().get(species_key(tgt_name))
                     if not tgt_rec:
                         ensure_species_in_db(tgt_name)
-                        tgt_rec = STATE.get("species_db", {}).get(species_key(tgt_name))
+                        tgt_rec = species_db().get(species_key(tgt_name))
 
                     tgt_types = purge_fairy_types_pair((tgt_rec or {}).get("types") or [])
                     tgt_t1, tgt_t2 = tgt_types[0], tgt_types[1]
@@ -4444,7 +6652,7 @@ def render_saveload():
     st.markdown("**Download your current progress**")
     st.download_button(
         "Download save.json",
-        data=json.dumps(STATE, indent=2, ensure_ascii=False),
+        data=json.dumps(state_for_save(STATE), indent=2, ensure_ascii=False),
         file_name="save.json"
     )
 
@@ -4516,5 +6724,181 @@ def _run_router():
     fn = next(fn for pid, _, fn in pages if pid == (ui.get("page") or sel_id))
     fn()
     
+# =============================================================================
+# Command line (maintenance tasks, no UI)
+# =============================================================================
+def _move_token_corpus() -> Dict[str, List[str]]:
+    """Move tokens as lookup_move receives them: learnset entries and sheet move cells."""
+    learnset_tokens = [m for entry in get_showdown_learnsets_cached().values()
+                       for m in (entry.get("learnset") or {})]
+    for entry in get_gen3_data_cached().values():
+        for mv in (entry.get("level") or {}).values():
+            learnset_tokens.extend(mv if isinstance(mv, list) else [mv])
+    sheet_tokens: List[str] = []
+    try:
+        tabs = fetch_sheet_tabs(DEFAULT_SHEET_URL)
+    except Exception as e:
+        print(f"warning: sheet not reachable ({e}); skipping sheet tokens")
+        tabs = {}
+    for tab in tabs.values():
+        for r in csv.reader(io.StringIO(tab.text)):
+            sheet_tokens.extend(c for c in r[6:10] if c.strip())
+    return {"learnsets": learnset_tokens, "sheet": sheet_tokens}
+
+def _bench_move_resolution(tokens: List[str], repeat: int) -> Dict[str, float]:
+    """µs per call: lookup without the memo, memoized lookup, canonical_typed."""
+    def uncached(tok):  # lookup_move as it was before the token memos
+        s_clean = _PARENTHETICAL_RE.sub("", clean_invisibles((tok or "").strip())).strip()
+        return moves.get(move_id(s_clean)) or moves.get(norm_key(s_clean))
+
+    moves = move_registry()
+
+    def per_call(fn) -> float:
+        t0 = time.perf_counter()
+        for _ in range(repeat):
+            for t in tokens:
+                fn(t)
+        return (time.perf_counter() - t0) / (repeat * len(tokens)) * 1e6
+
+    mismatches = sum(1 for t in tokens if uncached(t) is not lookup_move(t))
+    return {
+        "uncached": per_call(uncached),
+        "memoized": per_call(lookup_move),
+        "canonical_typed": per_call(canonical_typed),
+        "mismatches": mismatches,
+    }
+
+def _simulate_cold_sessions(sessions: int, coalesce: bool, sheet: bool) -> Dict:
+    """
+    Drop the process-wide data, then start `sessions` threads at the same
+    instant, each doing a session's bootstrap loads. Returns timing, how many
+    times each build actually ran vs. joined another run, and the errors seen.
+    """
+    _dataset_store_for_process.clear()
+    _sheet_tab_store_for_process.clear()
+    _single_flight_for_process.clear()
+    _RUN_MEMO.clear()
+    for c in _bounded_caches().values():
+        c.clear()
+    single_flight().enabled = coalesce
+
+    barrier = threading.Barrier(sessions)
+    errors: List[str] = []
+
+    def _session():
+        barrier.wait()
+        try:
+            for name in DATASETS:
+                load_dataset(name)
+            if sheet:
+                _build_encounters_for("Bulbasaur", DEFAULT_SHEET_URL, fetch_sheet_tabs(DEFAULT_SHEET_URL))
+        except Exception as e:
+            errors.append(f"{type(e).__name__}: {e}")
+
+    threads = [threading.Thread(target=_session, name=f"frlg-session-{i}") for i in range(sessions)]
+    t0 = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    flights = single_flight()
+    return {
+        "seconds": time.perf_counter() - t0,
+        "runs": dict(flights.runs),
+        "joined": dict(flights.joined),
+        "timeouts": flights.timeouts,
+        "errors": errors,
+    }
+
+def _cli_main(argv: List[str]) -> int:
+    import argparse
+    ap = argparse.ArgumentParser(prog="FRLG_Companion_App - Online.py")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+
+    p_bundle = sub.add_parser("compile-bundle", help="precompile the species/move/learnset bundle")
+    p_bundle.add_argument("-o", "--output", default=SPECIES_BUNDLE_PATH)
+
+    p_pack = sub.add_parser("compile-encounters", help="freeze the opponents sheet into an offline encounter pack")
+    p_pack.add_argument("-o", "--output", default=ENCOUNTER_PACK_PATH)
+    p_pack.add_argument("--sheet", default=DEFAULT_SHEET_URL, help="sheet URL the tabs belong to")
+    p_pack.add_argument("--csv", action="append", default=[], metavar="TAB=FILE",
+                        help="use an exported tab CSV instead of downloading; TAB is a starter or gid (repeatable)")
+
+    p_bench = sub.add_parser("bench-moves", help="time move-token resolution on real learnset and sheet tokens")
+    p_bench.add_argument("-n", "--repeat", type=int, default=20)
+
+    p_load = sub.add_parser("load-test", help="start N cold sessions at once, with and without single-flight")
+    p_load.add_argument("-n", "--sessions", type=int, default=16)
+    p_load.add_argument("--no-sheet", action="store_true", help="datasets only, skip the opponents sheet")
+
+    args = ap.parse_args(argv)
+    if args.cmd == "compile-bundle":
+        t0 = time.perf_counter()
+        bundle = compile_species_bundle(args.output)
+        print(f"wrote {args.output}: {len(bundle['species'])} species, {len(bundle['moves'])} moves, "
+              f"{os.path.getsize(args.output)} bytes in {time.perf_counter() - t0:.2f}s")
+        missing = [n for n, sha in bundle["sources"].items() if not sha]
+        if missing:
+            print(f"warning: compiled without {', '.join(missing)}")
+    elif args.cmd == "compile-encounters":
+        if args.csv:
+            doc_id = sheet_doc_id(args.sheet) or "local"
+            tabs = {}
+            for spec in args.csv:
+                tab, _, path = spec.partition("=")
+                gid = STARTER_GID.get(tab.strip().title(), tab.strip())
+                if not path or gid not in STARTER_GID.values():
+                    print(f"error: --csv {spec}: expected TAB=FILE with TAB one of "
+                          f"{', '.join(STARTER_OPTIONS)} or their gids")
+                    return 2
+                with open(path, "rb") as f:
+                    tabs[gid] = SheetTab(doc_id, gid, decode_bytes(f.read()))
+        else:
+            tabs = fetch_sheet_tabs(args.sheet)
+        if not any(STARTER_GID.get(s) in tabs for s in STARTER_OPTIONS):
+            print("error: no starter tab to compile")
+            return 1
+        t0 = time.perf_counter()
+        pack = compile_encounter_pack(args.sheet, tabs, args.output)
+        for starter, encs in pack["starters"].items():
+            print(f"  {starter}: {len(encs)} encounters, {sum(len(e[2]) for e in encs)} Pokémon")
+        print(f"wrote {args.output}: {len(pack['species'])} species, {len(pack['moves'])} moves, "
+              f"{os.path.getsize(args.output)} bytes in {time.perf_counter() - t0:.2f}s")
+    elif args.cmd == "bench-moves":
+        failed = False
+        for corpus, tokens in _move_token_corpus().items():
+            if not tokens:
+                continue
+            r = _bench_move_resolution(tokens, args.repeat)
+            print(f"{corpus}: {len(tokens)} tokens ({len(set(tokens))} distinct) x{args.repeat}  "
+                  f"uncached {r['uncached']:.2f} µs  memoized {r['memoized']:.2f} µs  "
+                  f"({r['uncached'] / r['memoized']:.1f}x)  canonical_typed {r['canonical_typed']:.2f} µs")
+            if r["mismatches"]:
+                print(f"error: {r['mismatches']} tokens resolved differently with the memo")
+                failed = True
+        print(f"memo sizes: clean_move_token {len(_clean_token_memo())}, lookup_move {len(move_registry().resolved)} "
+              f"(cap {TOKEN_MEMO_MAX})")
+        return 1 if failed else 0
+    elif args.cmd == "load-test":
+        failed = False
+        print(f"{args.sessions} simultaneous cold sessions")
+        for coalesce in (False, True):
+            r = _simulate_cold_sessions(args.sessions, coalesce, sheet=not args.no_sheet)
+            print(f"  {'single-flight' if coalesce else 'independent'}: {r['seconds']:.2f}s, "
+                  f"{len(r['errors'])} session errors, {r['timeouts']} timeouts")
+            # one build per dataset and one sheet download is the most a coalesced boot should run
+            expected = {"dataset": len(DATASETS), "sheet": 1}
+            for name in expected:
+                if name in r["runs"]:
+                    print(f"    {name}: ran {r['runs'][name]}x, joined {r['joined'].get(name, 0)}x")
+            for err in sorted(set(r["errors"])):
+                print(f"    error: {err}")
+            if coalesce:
+                failed = any(r["runs"].get(name, 0) > n for name, n in expected.items())
+        return 1 if failed else 0
+    return 0
+
 # ========= start app =========
+if CLI_MODE:
+    sys.exit(_cli_main(sys.argv[1:]))
 _run_router()
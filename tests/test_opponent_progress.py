@@ -0,0 +1,72 @@
+import json
+import os
+import runpy
+
+import pytest
+
+APP = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "FRLG_Companion_App - Online.py")
+
+
+@pytest.fixture(scope="module")
+def app(tmp_path_factory):
+    cache = tmp_path_factory.mktemp("cache")
+    os.environ.update(
+        FRLG_DATA_SOURCE="local",
+        FRLG_CACHE_DIR=str(cache),
+        FRLG_HTTP_CACHE_DIR=str(cache / "http"),
+        FRLG_SPECIES_BUNDLE=str(cache / "none.json"),
+        FRLG_SPECIES_BUNDLE_BUILD="0",
+        FRLG_ENCOUNTER_PACK=str(cache / "none.pkl"),
+    )
+    return runpy.run_path(APP, run_name="frlg_app")
+
+
+def _mon(species, level, row):
+    return {"species": species, "level": level, "types": ["Normal", None], "moves": [], "source_row": row, "total": 250}
+
+
+def _start(app, encounters):
+    state = app["STATE"]
+    state["opponents"] = {"meta": {"sheet_url": "", "last_loaded": ""}, "beaten": 0, "cleared": []}
+    table = app["intern_encounter_table"](encounters)
+    state["opponents"]["meta"]["table"] = table.table_id
+    return state["opponents"], table
+
+
+def test_undo_then_refresh_keeps_the_undone_mon(app):
+    encounters = [{"label": "Lass Janice", "mons": [_mon("Pidgey", 9, 1), _mon("Rattata", 9, 2)]}]
+    opp, table = _start(app, encounters)
+    first = app["beat_opponents"](table, 0, [0], "pokemon")
+    app["beat_opponents"](table, 0, [1], "trainer")
+    app["undo_cleared"](first)
+    assert opp["beaten"] == 0b10
+
+    # a refresh replays the saved log onto whatever table the sheet gives now
+    log = json.loads(json.dumps(opp["cleared"]))
+    assert app["replay_cleared_log"](table, log) == 0b10
+
+    encounters[0]["mons"].insert(0, _mon("Spearow", 8, 1))
+    for row, mon in enumerate(encounters[0]["mons"], 1):
+        mon["source_row"] = row
+    edited = app["intern_encounter_table"](encounters)
+    assert app["replay_cleared_log"](edited, log) == 0b100
+
+
+def test_replay_drops_trainer_mons_no_longer_on_the_sheet(app):
+    encounters = [{"label": "Hiker Marcos", "mons": [_mon("Geodude", 10, 1), _mon("Onix", 12, 2)]}]
+    opp, table = _start(app, encounters)
+    app["beat_opponents"](table, 0, [0, 1], "trainer")
+
+    encounters[0]["mons"][1] = _mon("Machop", 12, 2)
+    edited = app["intern_encounter_table"](encounters)
+    assert app["replay_cleared_log"](edited, opp["cleared"]) == 0b01
+
+
+def test_a_session_keeps_its_table_past_the_shared_lru(app):
+    encounters = [{"label": "Youngster Ben", "mons": [_mon("Rattata", 11, 1)]}]
+    opp, table = _start(app, encounters)
+    app["st"].session_state["_opponent_table"] = table
+    for n in range(app["ENCOUNTER_TABLES_MAX"] + 1):
+        app["intern_encounter_table"]([{"label": f"Trainer {n}", "mons": [_mon("Pidgey", n + 2, 1)]}])
+    del table
+    assert app["opponent_table"]().labels == ("Youngster Ben",)